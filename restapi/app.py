@@ -9,9 +9,16 @@ from fastapi_jwt_auth.exceptions import AuthJWTException
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi_utils.tasks import repeat_every
 from starlette.middleware.sessions import SessionMiddleware
-from config import database, redis_conn, settings
-from libs.ImageOcr import ImageOcrKTP, ImageOcrKIS
+from config import database, redis_conn, redis_binary_conn, settings
+from libs.OcrWorkerPool import OcrWorkerPool, OcrWorkerProxy
+from libs.OcrCache import OcrResultCache
+from libs.OcrJobQueue import OcrJobQueue
+from libs.OcrMetrics import OcrMetrics, request_timings, format_server_timing
+from libs.ImageQuality import ImageQualityStats
+from libs.CardClassifier import CardClassifier
 from libs.NikExtraction import NikExtraction
+from libs.AreaCode import get_area_code_index
+from libs.RegionTrie import RegionTrie
 from libs.ClearData import clear_qrcode_expired
 from libs.ConnectionManager import ConnectionDashboard
 from routers import (
@@ -40,15 +47,61 @@ def authjwt_exception_handler(request: Request, exc: AuthJWTException):
         content={"detail": exc.message}
     )
 
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    # stage timing of the ocr, only when the client ask for it with "X-Server-Timing: 1"
+    if not request.headers.get('x-server-timing'):
+        return await call_next(request)
+
+    timings = dict()
+    request_timings.set(timings)
+    response = await call_next(request)
+    if timings:
+        response.headers['Server-Timing'] = format_server_timing(timings)
+    return response
+
 @app.on_event("startup")
 async def startup():
     app.state.redis = redis_conn
     await database.connect()
-    # set image ocr
-    app.state.ocr_kis = ImageOcrKIS()
-    app.state.ocr_ktp = ImageOcrKTP()
+    # set image ocr, the heavy work runs in a separate process pool
+    ocr_pool = OcrWorkerPool(
+        max_workers=settings.ocr_max_workers,
+        max_concurrency=settings.ocr_max_concurrency,
+        job_timeout=settings.ocr_job_timeout,
+        max_jobs_per_worker=settings.ocr_max_jobs_per_worker,
+        opencv_threads=settings.ocr_opencv_threads,
+        engine_name=settings.ocr_engine
+    )
+    ocr_pool.start()
+    ocr_cache = OcrResultCache(
+        redis=redis_conn,
+        ttl=settings.ocr_cache_ttl,
+        max_size=settings.ocr_cache_max_size,
+        max_distance=settings.ocr_cache_max_distance,
+        max_thumbnail_diff=settings.ocr_cache_max_thumbnail_diff
+    ) if settings.ocr_cache_enabled else None
+    ocr_quality_stats = ImageQualityStats(redis=redis_conn)
+    ocr_metrics = OcrMetrics(redis=redis_conn) if settings.ocr_metrics_enabled else None
+    app.state.ocr_pool = ocr_pool
+    app.state.ocr_cache = ocr_cache
+    app.state.ocr_quality_stats = ocr_quality_stats
+    app.state.ocr_metrics = ocr_metrics
+    app.state.ocr_kis = OcrWorkerProxy(ocr_pool,'kis',ocr_cache,ocr_quality_stats,ocr_metrics)
+    app.state.ocr_ktp = OcrWorkerProxy(ocr_pool,'ktp',ocr_cache,ocr_quality_stats,ocr_metrics)
+    app.state.ocr_paspor = OcrWorkerProxy(ocr_pool,'paspor',ocr_cache,ocr_quality_stats,ocr_metrics)
+    app.state.card_classifier = CardClassifier(min_ratio=settings.ocr_kind_min_color)
+    # ocr job consumed by ocr_worker.py
+    app.state.ocr_jobs = OcrJobQueue(
+        redis=redis_binary_conn,
+        ttl=settings.ocr_job_ttl,
+        max_retries=settings.ocr_job_max_retries,
+        visibility_timeout=settings.ocr_job_visibility_timeout
+    )
     # set ktp nik extraction
     app.state.nik_extraction = NikExtraction()
+    # set region autocomplete, built once from the area code dataset
+    app.state.region_trie = RegionTrie(get_area_code_index(),settings.region_search_max_results)
     # set connection websocket
     dashboard = ConnectionDashboard()
     app.state.dashboard = dashboard
@@ -61,6 +114,7 @@ def clear_data():
 @app.on_event("shutdown")
 async def shutdown():
     await database.disconnect()
+    app.state.ocr_pool.shutdown()
 
 if settings.stage_app == "development":
     @app.get("/docs",include_in_schema=False)
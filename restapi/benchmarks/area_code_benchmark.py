@@ -0,0 +1,68 @@
+"""
+Load time and memory of the nik area code dataset, the list of dicts that used to be
+a Settings field against the columnar dataset of libs.AreaCode
+
+    python -m benchmarks.area_code_benchmark
+
+Every variant run in a fresh interpreter, rss is measured before and after the load
+and the index build. Private (anon) rss is what every worker pay again, file backed
+rss of the memory mapped binary is shared by every process.
+"""
+import os, sys, json, tempfile, subprocess
+
+MEASURE = """
+import time, gc, json
+def rss():
+    with open('/proc/self/status') as f:
+        status = dict(line.split(':', 1) for line in f)
+    return {{k: int(status[k].split()[0]) for k in ['RssAnon', 'RssFile']}}
+import numpy, csv
+from pydantic import BaseModel
+from typing import List
+gc.collect()
+before, started_at = rss(), time.perf_counter()
+{load}
+elapsed = time.perf_counter() - started_at
+gc.collect()
+after = rss()
+print(json.dumps({{'time': elapsed, 'anon': after['RssAnon'] - before['RssAnon'], 'file': after['RssFile'] - before['RssFile']}}))
+"""
+
+VARIANTS = {
+    'list of dicts (Settings field)': """
+with open('migration_data/nik_area_code.csv', 'r') as f:
+    data = [
+        {{'kodewilayah': row[0], 'provinsi': row[1], 'kabupatenkota': row[2], 'kecamatan': row[3]}}
+        for row in csv.reader(f, delimiter=',')
+    ]
+class Settings(BaseModel):
+    nik_area_code_data: list = data
+Settings()
+next(filter(lambda row: row['kodewilayah'] == '510305', Settings().nik_area_code_data))
+""",
+    'columnar from csv': """
+from libs.AreaCode import AreaCodeData, AreaCodeIndex
+AreaCodeIndex(AreaCodeData.from_csv()).subdistrict('510305')
+""",
+    'columnar memory mapped': """
+from libs.AreaCode import AreaCodeData, AreaCodeIndex
+AreaCodeIndex(AreaCodeData.from_binary({path!r})).subdistrict('510305')
+"""
+}
+
+def main() -> None:
+    from libs.AreaCode import build_binary
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'nik_area_code.npy')
+        build_binary(path=path)
+
+        print(f"{'variant':<32} {'load ms':>10} {'private KiB':>12} {'shared KiB':>12}")
+        for name, load in VARIANTS.items():
+            code = MEASURE.format(load=load.format(path=path))
+            output = subprocess.check_output([sys.executable, '-c', code], cwd=os.getcwd())
+            result = json.loads(output.decode().strip().splitlines()[-1])
+            print(f"{name:<32} {result['time'] * 1000:>10.1f} {result['anon']:>12} {result['file']:>12}")
+
+if __name__ == '__main__':
+    main()
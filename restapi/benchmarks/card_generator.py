@@ -0,0 +1,307 @@
+"""
+Synthetic ktp and kis card corpus for the ocr benchmark, no real citizen card needed
+
+    python -m benchmarks.card_generator --output /tmp/cards --count 1000 --kind ktp kis
+    python -m benchmarks.ocr_benchmark --corpus /tmp/cards
+
+Every card is drawn with Pillow from a random identity whose nik use a real area code
+of migration_data/nik_area_code.csv, then photographed: put on a background, rotated,
+warped, blurred, noised and jpeg compressed. The ground truth of every image is written
+to labels.json in the format read by benchmarks.ocr_benchmark.
+"""
+import os, csv, json, random, argparse, functools
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+AREA_CODE_CSV = os.path.join('migration_data', 'nik_area_code.csv')
+# size of a id-1 card (85.6 x 54 mm) at the resolution of a phone photo
+CARD_SIZE = (1400, 883)
+
+FONTS = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+    'arial.ttf'
+]
+MONO_FONTS = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSansMono-Bold.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationMono-Bold.ttf',
+    'courbd.ttf'
+]
+
+MALE_NAMES = [
+    'AGUS', 'BUDI', 'WAYAN', 'MADE', 'NYOMAN', 'KETUT', 'PUTU', 'ANDI', 'RIZKY', 'FAJAR',
+    'DIMAS', 'YOGA', 'ARIF', 'HENDRA', 'IKHSAN', 'BAGUS', 'GEDE', 'KOMANG', 'EKO', 'SURYA'
+]
+FEMALE_NAMES = [
+    'SITI', 'DEWI', 'AYU', 'PUTRI', 'RINA', 'DESAK', 'LUH', 'NI', 'INDAH', 'FITRI',
+    'MAYA', 'RATNA', 'WULAN', 'SRI', 'NOVI', 'KADEK', 'LESTARI', 'ANISA', 'YUNI', 'TIARA'
+]
+FAMILY_NAMES = [
+    'PRADIPTA', 'DEWANTARA', 'SUTRISNI', 'SANTOSO', 'WIJAYA', 'SAPUTRA', 'HIDAYAT', 'KUSUMA',
+    'PERMANA', 'NUGROHO', 'SETIAWAN', 'HARTONO', 'PRATAMA', 'MAHENDRA', 'ARTHA', 'SUDARMA',
+    'WIRAWAN', 'LESTARI', 'RAHAYU', 'PURNAMA', 'ASTUTI', 'SUWARNI', 'GUNAWAN', 'SUSANTO'
+]
+STREETS = [
+    'MERAK', 'MAWAR', 'MELATI', 'SUDIRMAN', 'GATOT SUBROTO', 'DIPONEGORO', 'KARTINI', 'GAJAH MADA',
+    'HAYAM WURUK', 'IMAM BONJOL', 'TEUKU UMAR', 'AHMAD YANI', 'PAHLAWAN', 'KENANGA', 'CEMPAKA'
+]
+VILLAGES = [
+    'JIMBARAN', 'KEDONGANAN', 'TUBAN', 'SUKAMAJU', 'SUKAJAYA', 'MEKARSARI', 'KARANGANYAR',
+    'SUMBERSARI', 'TEGALREJO', 'MARGAMULYA', 'SIDOREJO', 'PANJER', 'SESETAN', 'DALUNG'
+]
+RELIGIONS = ['ISLAM', 'KRISTEN', 'KATHOLIK', 'HINDU', 'BUDDHA', 'KONGHUCU']
+JOBS = ['PELAJAR/MAHASISWA', 'KARYAWAN SWASTA', 'WIRASWASTA', 'PEGAWAI NEGERI SIPIL', 'PETANI/PEKEBUN', 'MENGURUS RUMAH TANGGA']
+FASKES = ['BP GANGGA MEDIKA', 'PUSKESMAS KUTA SELATAN', 'KLINIK PRATAMA SEHAT', 'DR. ANDI WIJAYA', 'PUSKESMAS DENPASAR BARAT']
+MONTHS = [
+    'JANUARI', 'FEBRUARI', 'MARET', 'APRIL', 'MEI', 'JUNI',
+    'JULI', 'AGUSTUS', 'SEPTEMBER', 'OKTOBER', 'NOVEMBER', 'DESEMBER'
+]
+
+@functools.lru_cache(maxsize=1)
+def load_area_codes(path: str) -> List[Tuple[str, str, str, str]]:
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        return [(row['kodewilayah'], row['provinsi'], row['kabupatenkota'], row['kecamatan']) for row in reader]
+
+def load_font(candidates: List[str], size: int) -> ImageFont.FreeTypeFont:
+    for path in candidates:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+def random_identity(rng: random.Random, area_codes: List[tuple]) -> dict:
+    code, province, regency, district = rng.choice(area_codes)
+    gender = rng.choice(['LAKI-LAKI', 'PEREMPUAN'])
+    first = rng.choice(MALE_NAMES if gender == 'LAKI-LAKI' else FEMALE_NAMES)
+    name = " ".join([first] + rng.sample(FAMILY_NAMES, rng.randint(1, 2)))
+
+    year, month, day = rng.randint(1945, 2005), rng.randint(1, 12), rng.randint(1, 28)
+    # woman has 40 added to the day of birth in the nik
+    nik = f"{code}{day + (40 if gender == 'PEREMPUAN' else 0):02d}{month:02d}{year % 100:02d}{rng.randint(1, 9999):04d}"
+    birth_place = rng.choice(area_codes)[2].replace('Kab. ', '').replace('Kota ', '').upper()
+
+    return {
+        'nik': nik,
+        'name': name,
+        'gender': gender,
+        'birth_place': birth_place,
+        'birth_date': (day, month, year),
+        'province': province.upper(),
+        'regency': regency.upper().replace('KAB. ', 'KABUPATEN '),
+        'district': district.upper(),
+        'village': rng.choice(VILLAGES),
+        'street': f"JL. {rng.choice(STREETS)} NO. {rng.randint(1, 200)}",
+        'rt_rw': f"{rng.randint(0, 20):03d}/{rng.randint(0, 20):03d}",
+        'religion': rng.choice(RELIGIONS),
+        'married': rng.choice(['BELUM KAWIN', 'KAWIN', 'CERAI HIDUP']),
+        'job': rng.choice(JOBS),
+        'no_card': f"000{rng.randint(0, 9999999999):010d}",
+        'faskes': rng.choice(FASKES)
+    }
+
+def draw_rows(draw: ImageDraw.ImageDraw, rows: List[tuple], font: ImageFont.FreeTypeFont, x: Tuple[int, int, int]) -> None:
+    # x of the label, the colon and the value
+    label_x, colon_x, value_x = x
+    for label, value, y, indent in rows:
+        if label: draw.text((label_x + indent, y), label, fill=(25, 25, 35), font=font)
+        if label: draw.text((colon_x, y), ":", fill=(25, 25, 35), font=font)
+        draw.text((value_x, y), value, fill=(10, 10, 20), font=font)
+
+def draw_ktp(identity: dict, rng: random.Random) -> Tuple[Image.Image, dict]:
+    width, height = CARD_SIZE
+    card = Image.new('RGB', CARD_SIZE, (150, 195, 235))
+    draw = ImageDraw.Draw(card)
+
+    # wavy security print of the blue background
+    for offset in range(0, height, 9):
+        points = [(x, offset + 6 * np.sin(x / 35 + offset / 50)) for x in range(0, width + 20, 20)]
+        draw.line(points, fill=(125, 175, 225), width=2)
+
+    font = load_font(FONTS, int(height * 0.034))
+    header = load_font(FONTS, int(height * 0.045))
+    mono = load_font(MONO_FONTS, int(height * 0.062))
+
+    for text, y in [(f"PROVINSI {identity['province']}", 0.05), (identity['regency'], 0.11)]:
+        text_width = draw.textlength(text, font=header)
+        draw.text(((width * 0.55) - text_width / 2, height * y), text, fill=(20, 20, 30), font=header)
+
+    draw.text((width * 0.04, height * 0.18), "NIK", fill=(20, 20, 30), font=mono)
+    draw.text((width * 0.22, height * 0.18), ":", fill=(20, 20, 30), font=mono)
+    draw.text((width * 0.26, height * 0.18), identity['nik'], fill=(10, 10, 20), font=mono)
+
+    day, month, year = identity['birth_date']
+    # long address is wrapped to the next line like the printed card
+    address = identity['street'] + f" {identity['village']},"
+    first_line, second_line = address, f"LINGK. {identity['district']}"
+
+    rows = [
+        ("Nama", identity['name'], 0.27, 0),
+        ("Tempat/Tgl Lahir", f"{identity['birth_place']}, {day:02d}-{month:02d}-{year}", 0.315, 0),
+        ("Jenis kelamin", identity['gender'], 0.36, 0),
+        ("Alamat", first_line, 0.405, 0),
+        (None, second_line, 0.45, 0),
+        ("RT/RW", identity['rt_rw'], 0.495, 60),
+        ("Kel/Desa", identity['village'], 0.54, 60),
+        ("Kecamatan", identity['district'], 0.585, 60),
+        ("Agama", identity['religion'], 0.63, 0),
+        ("Status Perkawinan", identity['married'], 0.675, 0),
+        ("Pekerjaan", identity['job'], 0.72, 0),
+        ("Kewarganegaraan", "WNI", 0.765, 0),
+        ("Berlaku Hingga", "SEUMUR HIDUP", 0.81, 0)
+    ]
+    draw_rows(draw, [(a, b, height * y, i) for a, b, y, i in rows], font, (width * 0.035, width * 0.27, width * 0.285))
+    draw.text((width * 0.5, height * 0.36), f"Gol. Darah : {rng.choice(['A', 'B', 'AB', 'O', '-'])}", fill=(25, 25, 35), font=font)
+
+    # photo and the place and date of issue
+    draw.rectangle([width * 0.72, height * 0.2, width * 0.93, height * 0.66], fill=(30, 90, 190))
+    draw.text((width * 0.76, height * 0.68), identity['regency'].split()[-1], fill=(20, 20, 30), font=font)
+    draw.text((width * 0.755, height * 0.72), f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.randint(2012, 2022)}", fill=(20, 20, 30), font=font)
+
+    label = {
+        'kind': 'ktp',
+        'nik': identity['nik'],
+        'name': identity['name'],
+        'birth_date': f"{day:02d}-{month:02d}-{year}",
+        'birth_place': identity['birth_place'],
+        'gender': identity['gender'],
+        'address': f"{first_line} {second_line}"
+    }
+    return card, label
+
+def draw_kis(identity: dict, rng: random.Random) -> Tuple[Image.Image, dict]:
+    width, height = CARD_SIZE
+    card = Image.new('RGB', CARD_SIZE, (226, 228, 226))
+    draw = ImageDraw.Draw(card)
+
+    # gray map of the background
+    for _ in range(40):
+        x, y = rng.randint(0, width), rng.randint(int(height * 0.3), height)
+        draw.ellipse([x, y, x + rng.randint(40, 160), y + rng.randint(15, 50)], fill=(205, 207, 205))
+
+    draw.rectangle([0, 0, width, height * 0.25], fill=(30, 165, 85))
+    title = load_font(FONTS, int(height * 0.065))
+    draw.text((width * 0.26, height * 0.08), "Kartu Indonesia Sehat", fill=(235, 245, 235), font=title)
+
+    # barcode of the card number
+    x = width * 0.09
+    while x < width * 0.6:
+        bar = rng.choice([3, 5, 8])
+        draw.rectangle([x, height * 0.26, x + bar, height * 0.37], fill=(15, 15, 15))
+        x += bar + rng.choice([4, 6, 9])
+
+    font = load_font(FONTS, int(height * 0.034))
+    small = load_font(FONTS, int(height * 0.024))
+    day, month, year = identity['birth_date']
+    first_line = f"{identity['street']}, {identity['village']}"
+    second_line = f"{identity['district']}, {identity['regency'].replace('KABUPATEN ', 'KAB. ')}"
+
+    rows = [
+        ("Nomor Kartu", identity['no_card'], 0.42, 0),
+        ("Nama", identity['name'], 0.47, 0),
+        ("Alamat", first_line, 0.52, 0),
+        (None, second_line, 0.56, 0),
+        ("Tanggal lahir", f"{day} {MONTHS[month - 1]} {year}", 0.63, 0),
+        ("NIK", identity['nik'], 0.68, 0),
+        ("Faskes Tingkat I", identity['faskes'], 0.73, 0)
+    ]
+    draw_rows(draw, [(a, b, height * y, i) for a, b, y, i in rows], font, (width * 0.09, width * 0.285, width * 0.3))
+
+    for i, text in enumerate([
+        "Syarat dan Ketentuan:",
+        "1. Kartu Peserta harap dibawa ketika berobat.",
+        "2. Apabila kartu ini disalahgunakan akan dikenakan sanksi.",
+        "Pusat Layanan Informasi BPJS Kesehatan 1500400"
+    ]):
+        draw.text((width * 0.1, height * (0.79 + i * 0.04)), text, fill=(60, 60, 60), font=small)
+
+    label = {
+        'kind': 'kis',
+        'no_card': identity['no_card'],
+        'nik': identity['nik'],
+        'name': identity['name'],
+        'birth_date': f"{day:02d}-{month:02d}-{year}",
+        'address': f"{first_line} {second_line}"
+    }
+    return card, label
+
+def photograph(card: Image.Image, rng: random.Random, np_rng: np.random.Generator) -> bytes:
+    """
+    Make the flat card look like a phone photo of it
+    :return: Jpeg bytes
+    """
+    width, height = card.size
+    # rounded corner of the plastic card
+    mask = Image.new('L', card.size, 0)
+    ImageDraw.Draw(mask).rounded_rectangle([0, 0, width - 1, height - 1], radius=int(height * 0.05), fill=255)
+
+    margin_x, margin_y = int(width * 0.12), int(height * 0.15)
+    scene = np.full((height + margin_y * 2, width + margin_x * 2, 3), rng.choice([(190, 150, 125), (120, 90, 60), (40, 40, 45), (165, 165, 160)]), np.uint8)
+    scene = np.clip(scene + np_rng.normal(0, 12, scene.shape), 0, 255).astype(np.uint8)
+    background = Image.fromarray(scene)
+    background.paste(card, (margin_x, margin_y), mask)
+    img = cv2.cvtColor(np.asarray(background), cv2.COLOR_RGB2BGR)
+
+    # rotation and perspective of a hand held camera
+    corners = np.float32([[margin_x, margin_y], [margin_x + width, margin_y], [margin_x + width, margin_y + height], [margin_x, margin_y + height]])
+    center = corners.mean(axis=0)
+    angle = np.deg2rad(rng.uniform(-6, 6))
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    target = (corners - center) @ rotation.T + center + np_rng.uniform(-0.03, 0.03, (4, 2)) * [width, height]
+    matrix = cv2.getPerspectiveTransform(corners, target.astype(np.float32))
+    img = cv2.warpPerspective(img, matrix, (img.shape[1], img.shape[0]), borderMode=cv2.BORDER_REFLECT)
+
+    # uneven light, focus and sensor noise
+    gradient = np.linspace(rng.uniform(0.8, 1.0), rng.uniform(1.0, 1.15), img.shape[1])[None, :, None]
+    img = img * gradient * rng.uniform(0.85, 1.1) + rng.uniform(-15, 15)
+    if (sigma := rng.uniform(0, 1.6)) > 0.3:
+        img = cv2.GaussianBlur(img, (0, 0), sigma)
+    img = np.clip(img + np_rng.normal(0, rng.uniform(2, 8), img.shape), 0, 255).astype(np.uint8)
+
+    _, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, rng.randint(55, 95)])
+    return buffer.tobytes()
+
+def generate_card(index: int, kind: str, seed: int, output: str) -> Tuple[str, dict]:
+    # every card has its own seed so the corpus is the same whatever the worker count
+    rng, np_rng = random.Random(seed + index), np.random.default_rng(seed + index)
+    identity = random_identity(rng, load_area_codes(AREA_CODE_CSV))
+    card, label = (draw_ktp if kind == 'ktp' else draw_kis)(identity, rng)
+
+    filename = f"{kind}_{index:06d}.jpg"
+    with open(os.path.join(output, filename), 'wb') as f:
+        f.write(photograph(card, rng, np_rng))
+
+    return filename, label
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic labelled ktp and kis corpus")
+    parser.add_argument('--output', required=True, help="directory of the images and labels.json")
+    parser.add_argument('--count', type=int, default=100, help="number of card to generate")
+    parser.add_argument('--kind', nargs='+', default=['ktp', 'kis'], choices=['ktp', 'kis'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+
+    labels: Dict[str, dict] = dict()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        jobs = [
+            executor.submit(generate_card, index, args.kind[index % len(args.kind)], args.seed, args.output)
+            for index in range(args.count)
+        ]
+        for job in jobs:
+            filename, label = job.result()
+            labels[filename] = label
+
+    with open(os.path.join(args.output, 'labels.json'), 'w') as f:
+        json.dump(labels, f, indent=2, sort_keys=True)
+
+    print(f"{len(labels)} cards written to {args.output}")
+
+if __name__ == '__main__':
+    main()
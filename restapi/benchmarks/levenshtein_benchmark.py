@@ -0,0 +1,77 @@
+"""
+Micro benchmark of the bit-parallel levenshtein against the previous numpy implementation
+
+    python -m benchmarks.levenshtein_benchmark
+"""
+import timeit
+import numpy as np
+from libs import EditDistance
+
+MONTHS = [
+    'januari', 'februari', 'maret', 'april', 'mei', 'juni',
+    'juli', 'agustus', 'september', 'oktober', 'november', 'desember'
+]
+GENDERS = ['laki-laki', 'laki', 'perempuan', 'wanita']
+# words as they come out of tesseract on a kis card
+TOKENS = [
+    'nomor', 'kartu', '0001581883345', 'nama', 'nyoman', 'pradipta', 'dewantara', 'alamat',
+    'jl.', 'merak', 'c', '4/34', 'puri', 'gading,', 'lingk.', 'bhuana', 'gubug', 'tanggal',
+    'lahir', '19', 'mel', '1999', 'nik', '5103051905990006', 'faskes', 'tingkat', 'i', 'bp',
+    'gangga', 'medika', 'septmber', 'lak1-laki', 'perempuan', 'wanta'
+]
+
+def levenshtein_numpy(source: str, target: str) -> int:
+    if len(source) < len(target):
+        return levenshtein_numpy(target, source)
+
+    if len(target) == 0:
+        return len(source)
+
+    source = np.array(tuple(source))
+    target = np.array(tuple(target))
+
+    previous_row = np.arange(target.size + 1)
+    for s in source:
+        current_row = previous_row + 1
+        current_row[1:] = np.minimum(current_row[1:], np.add(previous_row[:-1], target != s))
+        current_row[1:] = np.minimum(current_row[1:], current_row[0:-1] + 1)
+        previous_row = current_row
+
+    return previous_row[-1]
+
+def workload(func) -> None:
+    for keyword in MONTHS + GENDERS:
+        for token in TOKENS:
+            func(keyword, token)
+
+def main() -> None:
+    pairs = len(MONTHS + GENDERS) * len(TOKENS)
+
+    # every result must be the same before comparing the speed
+    for keyword in MONTHS + GENDERS:
+        for token in TOKENS:
+            assert EditDistance.levenshtein(keyword, token) == levenshtein_numpy(keyword, token)
+
+    def bit_parallel(source: str, target: str) -> int:
+        return EditDistance.levenshtein.__wrapped__(source, target)
+
+    def bit_parallel_threshold(source: str, target: str) -> int:
+        return EditDistance.levenshtein.__wrapped__(source, target, 2)
+
+    variants = {
+        'numpy': lambda: workload(levenshtein_numpy),
+        'bit-parallel': lambda: workload(bit_parallel),
+        'bit-parallel max_distance=2': lambda: workload(bit_parallel_threshold),
+        'bit-parallel memoized': lambda: workload(EditDistance.levenshtein),
+    }
+
+    number = 20
+    baseline = None
+    print(f"{pairs} pairs per run, best of 5 x {number} runs")
+    for name, func in variants.items():
+        best = min(timeit.repeat(func, number=number, repeat=5)) / number
+        baseline = baseline or best
+        print(f"{name:<30} {best * 1e6 / pairs:8.2f} us/pair {baseline / best:8.1f}x")
+
+if __name__ == '__main__':
+    main()
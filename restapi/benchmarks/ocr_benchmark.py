@@ -0,0 +1,214 @@
+"""
+Latency, throughput and accuracy of the card ocr on a labelled corpus
+
+    python -m benchmarks.ocr_benchmark --corpus static/test_image --workers 4 --output report.json
+    python -m benchmarks.ocr_benchmark --baseline report.json
+    python -m benchmarks.ocr_benchmark --profile fast --baseline report.json
+
+The corpus is a directory of card images with a labels.json next to them:
+{"ktp1.jpg": {"kind": "ktp", "nik": "5103051905990006", "name": "...", ...}},
+a field that is not labelled is not scored. The report is plain json so two
+commits can be compared with --baseline or any json diff.
+"""
+import os, json, time, argparse, platform, functools, subprocess, multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from config import settings
+from libs import EditDistance
+from libs.ImageQuality import ImageQualityError
+from libs.OcrWorkerPool import worker_initializer, run_job
+from typing import Dict, List, Optional
+
+def load_corpus(directory: str) -> List[dict]:
+    with open(os.path.join(directory, 'labels.json')) as f:
+        labels = json.load(f)
+
+    corpus = list()
+    for filename, label in sorted(labels.items()):
+        with open(os.path.join(directory, filename), 'rb') as f:
+            image = f.read()
+        fields = {k: v for k, v in label.items() if k != 'kind'}
+        corpus.append({'filename': filename, 'kind': label['kind'], 'image': image, 'label': fields})
+
+    return corpus
+
+def normalize(value: Optional[str]) -> Optional[str]:
+    return " ".join(value.upper().split()) if value is not None else None
+
+def similarity(result: Optional[str], label: str) -> float:
+    # 1.0 when equal, 0.0 when nothing in common or not found
+    if result is None:
+        return 0.0
+    longest = max(len(result), len(label)) or 1
+    return 1 - EditDistance.levenshtein(result, label) / longest
+
+def percentiles(values: List[float]) -> dict:
+    # second to millisecond
+    values = np.array(values) * 1000
+    return {
+        'p50': round(float(np.percentile(values, 50)), 2),
+        'p95': round(float(np.percentile(values, 95)), 2),
+        'mean': round(float(values.mean()), 2)
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_card(kind: str, image: bytes, profile: Optional[str] = None) -> tuple:
+    try:
+        return run_job(kind, 'extract_image_to_text', image, profile=profile)
+    except ImageQualityError as err:
+        return {'error': err.reason}, dict()
+
+def measure_latency(corpus: List[dict], repeat: int, profile: Optional[str]) -> tuple:
+    """
+    Run every card sequentially in this process
+    :return: (stage percentiles per kind, result of every card)
+    """
+    timings, results = dict(), dict()
+    for _ in range(repeat):
+        for card in corpus:
+            result, stages = run_card(card['kind'], card['image'], profile)
+            # ocr is deterministic, the first result is enough
+            results.setdefault(card['filename'], result)
+            for stage, seconds in stages.items():
+                timings.setdefault(card['kind'], dict()).setdefault(stage, list()).append(seconds)
+
+    latency = {
+        kind: {stage: percentiles(values) for stage, values in sorted(stages.items())}
+        for kind, stages in sorted(timings.items())
+    }
+    return latency, results
+
+def measure_throughput(
+    corpus: List[dict],
+    workers: int,
+    repeat: int,
+    profile: Optional[str],
+    opencv_threads: int,
+    engine: str
+) -> float:
+    """
+    Cards per second with a pool of workers like OcrWorkerPool
+    :return: Cards processed per second, the worker startup is not counted
+    """
+    jobs = [(card['kind'], card['image']) for card in corpus] * repeat
+    run = functools.partial(run_card, profile=profile)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=worker_initializer,
+        initargs=(opencv_threads, engine)
+    ) as executor:
+        # start and warm every worker before measuring
+        list(executor.map(run, *zip(*jobs[:workers])))
+
+        started_at = time.perf_counter()
+        list(executor.map(run, *zip(*jobs)))
+        elapsed = time.perf_counter() - started_at
+
+    return round(len(jobs) / elapsed, 3)
+
+def measure_accuracy(corpus: List[dict], results: Dict[str, dict]) -> dict:
+    scores = dict()
+    for card in corpus:
+        result = results[card['filename']]
+        for field, label in card['label'].items():
+            value = normalize(result.get(field))
+            score = scores.setdefault(card['kind'], dict()).setdefault(field, {'exact': [], 'similarity': []})
+            score['exact'].append(value == normalize(label))
+            score['similarity'].append(similarity(value, normalize(label)))
+
+    return {
+        kind: {
+            field: {
+                'count': len(score['exact']),
+                'exact': round(sum(score['exact']) / len(score['exact']), 4),
+                'similarity': round(sum(score['similarity']) / len(score['similarity']), 4)
+            } for field, score in sorted(fields.items())
+        } for kind, fields in sorted(scores.items())
+    }
+
+def print_report(report: dict, baseline: Optional[dict] = None) -> None:
+    def delta(current: float, previous: Optional[float]) -> str:
+        return f" ({current - previous:+.2f})" if previous is not None else ""
+
+    baseline = baseline or dict()
+    print(
+        f"{len(report['cards'])} cards x {report['meta']['repeat']} runs, "
+        f"engine {report['meta']['engine']}, profile {report['meta']['profile']}"
+    )
+
+    print(f"\n{'latency ms':<30} {'p50':>18} {'p95':>18}")
+    for kind, stages in report['latency'].items():
+        for stage, value in stages.items():
+            previous = baseline.get('latency', {}).get(kind, {}).get(stage, {})
+            print(
+                f"{kind + ' ' + stage:<30} {str(value['p50']) + delta(value['p50'], previous.get('p50')):>18} "
+                f"{str(value['p95']) + delta(value['p95'], previous.get('p95')):>18}"
+            )
+
+    print(f"\n{'workers':<30} {'cards/s':>18}")
+    for workers, value in report['throughput'].items():
+        previous = baseline.get('throughput', {}).get(workers)
+        print(f"{workers:<30} {str(value) + delta(value, previous):>18}")
+
+    print(f"\n{'accuracy':<30} {'exact':>18} {'similarity':>18}")
+    for kind, fields in report['accuracy'].items():
+        for field, value in fields.items():
+            previous = baseline.get('accuracy', {}).get(kind, {}).get(field, {})
+            print(
+                f"{kind + ' ' + field:<30} {str(value['exact']) + delta(value['exact'], previous.get('exact')):>18} "
+                f"{str(value['similarity']) + delta(value['similarity'], previous.get('similarity')):>18}"
+            )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the card ocr on a labelled corpus")
+    parser.add_argument('--corpus', default=os.path.join('static', 'test_image'), help="directory with labels.json")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="measure throughput from 1 to N workers")
+    parser.add_argument('--repeat', type=int, default=3, help="run every card this many times")
+    parser.add_argument('--engine', default=settings.ocr_engine, choices=['pytesseract', 'tesserocr'])
+    parser.add_argument('--profile', default=settings.ocr_default_profile, choices=list(settings.ocr_profiles))
+    parser.add_argument('--output', help="write the report to this json file")
+    parser.add_argument('--baseline', help="report of an earlier commit to compare with")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    worker_initializer(settings.ocr_opencv_threads, args.engine)
+
+    latency, results = measure_latency(corpus, args.repeat, args.profile)
+    throughput = {
+        str(workers): measure_throughput(corpus, workers, args.repeat, args.profile, settings.ocr_opencv_threads, args.engine)
+        for workers in range(1, args.workers + 1)
+    }
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'engine': args.engine,
+            'profile': args.profile,
+            'repeat': args.repeat,
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version()
+        },
+        'latency': latency,
+        'throughput': throughput,
+        'accuracy': measure_accuracy(corpus, results),
+        'cards': {filename: results[filename] for filename in sorted(results)}
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,12 @@
-import csv
+import os
 from redis import Redis
 from sqlalchemy import MetaData
 from databases import Database
 from datetime import timedelta
 from fastapi_jwt_auth import AuthJWT
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseSettings, PostgresDsn, validator
-from typing import Optional, Literal
+from pydantic import BaseModel, BaseSettings, PostgresDsn, conlist, validator
+from typing import Dict, Optional, Literal
 
 with open("public_key.txt") as f:
     public_key = f.read().strip()
@@ -14,12 +14,15 @@ with open("public_key.txt") as f:
 with open("private_key.txt") as f:
     private_key = f.read().strip()
 
-with open('migration_data/nik_area_code.csv', 'r') as f:
-    my_reader = csv.reader(f, delimiter=',')
-    nik_area_code_list = [
-        {'kodewilayah': row[0], 'provinsi': row[1], 'kabupatenkota': row[2], 'kecamatan': row[3]}
-        for row in my_reader
-    ]
+class OcrProfile(BaseModel):
+    # None keep the tesseract default, 1 is lstm only
+    oem: Optional[int] = None
+    # directory of other traineddata, e.g tessdata_best
+    tessdata_dir: Optional[str] = None
+    # size of the normalized card relative to ocr_card_width and ocr_card_height
+    scale: float = 1.0
+    # None run every step of ocr_ladder_steps
+    ladder_steps: Optional[conlist(Literal['basic','adaptive','deskew','upscale'], min_items=1)] = None
 
 class Settings(BaseSettings):
     authjwt_token_location: set = {"cookies"}
@@ -45,7 +48,50 @@ class Settings(BaseSettings):
     stage_app: Literal['production','development']
     vps_expired: str
     domain_expired: str
-    nik_area_code_data: list = nik_area_code_list
+
+    ocr_max_workers: Optional[int] = None
+    ocr_max_concurrency: Optional[int] = None
+    ocr_job_timeout: int = 30
+    ocr_max_jobs_per_worker: int = 200
+    ocr_opencv_threads: int = 1
+    ocr_engine: Literal['pytesseract','tesserocr'] = 'pytesseract'
+    ocr_ktp_layout: Literal['text','fields'] = 'text'
+    ocr_field_threads: int = 4
+    ocr_card_detection: bool = True
+    ocr_card_width: int = 1000
+    ocr_card_height: int = 630
+    ocr_max_image_side: int = 1600
+    ocr_fuzzy_max_distance: int = 2
+    ocr_quality_gate: bool = True
+    ocr_quality_min_side: int = 300
+    ocr_quality_min_sharpness: float = 100.0
+    # largest saturated blob on the print, relative to the card
+    ocr_quality_max_glare: float = 0.04
+    ocr_ladder_steps: conlist(Literal['basic','adaptive','deskew','upscale'], min_items=1) = ['basic','adaptive','deskew','upscale']
+    ocr_min_confidence: float = 70.0
+    ocr_kind_min_color: float = 0.05
+    ocr_cache_enabled: bool = True
+    ocr_cache_ttl: int = 3600
+    ocr_cache_max_size: int = 1000
+    # 0 is exact content only, a near match must also pass ocr_cache_max_thumbnail_diff
+    ocr_cache_max_distance: int = 0
+    ocr_cache_max_thumbnail_diff: float = 2.0
+    ocr_job_ttl: int = 3600
+    ocr_job_max_retries: int = 2
+    ocr_job_visibility_timeout: int = 120
+    ocr_job_poll_interval: float = 0.5
+    ocr_metrics_enabled: bool = True
+    ocr_profiles: Dict[str, OcrProfile] = {
+        'fast': OcrProfile(oem=1, scale=0.75, ladder_steps=['basic','adaptive']),
+        'balanced': OcrProfile(),
+        'accurate': OcrProfile(oem=1, tessdata_dir='/usr/share/tesseract-ocr/tessdata_best', scale=1.5)
+    }
+    ocr_default_profile: str = 'balanced'
+
+    nik_batch_max_size: int = 5000
+    nik_batch_chunk_size: int = 1000
+    region_search_max_results: int = 20
+    region_search_max_distance: int = 2
 
     access_expires: Optional[int] = None
     refresh_expires: Optional[int] = None
@@ -55,6 +101,20 @@ class Settings(BaseSettings):
         assert v.path and len(v.path) > 1, 'database must be provided'
         return v
 
+    @validator('ocr_max_workers',always=True)
+    def parse_ocr_max_workers(cls, v):
+        # leave one core for the api process
+        return v or max(1, (os.cpu_count() or 2) - 1)
+
+    @validator('ocr_max_concurrency',always=True)
+    def parse_ocr_max_concurrency(cls, v, values):
+        return v or values['ocr_max_workers'] * 2
+
+    @validator('ocr_default_profile',always=True)
+    def validate_ocr_default_profile(cls, v, values):
+        assert v in values.get('ocr_profiles', {}), 'ocr_default_profile must be one of ocr_profiles'
+        return v
+
     @validator('access_expires',always=True)
     def parse_access_expires(cls, v):
         return int(timedelta(hours=8).total_seconds())
@@ -73,6 +133,8 @@ settings = Settings()
 database = Database(settings.database_uri)
 templates = Jinja2Templates(directory="templates")
 redis_conn = Redis(host=settings.redis_db_host, port=6379, db=0, decode_responses=True)
+# ocr job hold the raw image, so the response must stay bytes
+redis_binary_conn = Redis(host=settings.redis_db_host, port=6379, db=0)
 
 @AuthJWT.load_config
 def get_config():
@@ -1,7 +1,8 @@
 from fastapi import UploadFile, Query, File, Form, Depends, HTTPException
-from libs.MagicImage import validate_single_upload_image
+from libs.MagicImage import validate_single_upload_image, validate_multiple_upload_images
 from libs.Parser import parse_int_list, parse_str_date, get_date_now
-from typing import Literal
+from config import settings
+from typing import List, Literal
 
 def upload_image_required(image: UploadFile = File(...)):
     return validate_single_upload_image(
@@ -10,15 +11,54 @@ def upload_image_required(image: UploadFile = File(...)):
         max_file_size=5
     )
 
+def upload_multiple_image_required(images: List[UploadFile] = File(...)):
+    return validate_multiple_upload_images(
+        images=images,
+        allow_file_ext=['jpg','png','jpeg'],
+        max_file_size=5,
+        max_file_in_list=10
+    )
+
 def identity_card_ocr_form(
-    kind: Literal['ktp','kis'] = Form(...),
+    kind: Literal['ktp','kis','paspor','auto'] = Form(...),
+    mode: Literal['full','nik_fast'] = Form('full'),
+    profile: str = Form(None),
     image: upload_image_required = Depends()
 ):
+    profile = profile or settings.ocr_default_profile
+    if profile not in settings.ocr_profiles:
+        raise HTTPException(status_code=422,detail=f"Profile must be one of {', '.join(settings.ocr_profiles)}.")
+
     return {
         'kind': kind,
+        'mode': mode,
+        'profile': profile,
         'image': image
     }
 
+def identity_card_ocr_job_form(
+    kind: Literal['ktp','kis','paspor','auto'] = Form(...),
+    image: upload_image_required = Depends()
+):
+    return {
+        'kind': kind,
+        'image': image
+    }
+
+def identity_card_ocr_batch_form(
+    kind: List[Literal['ktp','kis','paspor','auto']] = Form(...),
+    stream: bool = Form(False),
+    images: upload_multiple_image_required = Depends()
+):
+    if len(kind) != len(images):
+        raise HTTPException(status_code=422,detail="Each image must have a kind.")
+
+    return {
+        'kind': kind,
+        'stream': stream,
+        'images': images
+    }
+
 def get_all_query_client(
     q: str = Query(None,min_length=1),
     gender: Literal['LAKI-LAKI','PEREMPUAN'] = Query(None),
@@ -1,6 +1,9 @@
 #!/bin/bash
 set -e
 
+# area code dataset memory mapped by every process, see libs/AreaCode.py
+python3 -c "from libs.AreaCode import build_binary; build_binary()"
+
 if [ "$stage_app" = 'production' ]; then
   uvicorn app:app --host 0.0.0.0 --proxy-headers
 else
@@ -0,0 +1,140 @@
+import os, csv, sys, json, functools
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+AREA_CODE_CSV = os.path.join('migration_data', 'nik_area_code.csv')
+# prebuilt by build_binary, memory mapped so every process share the same pages
+AREA_CODE_BINARY = os.path.join('migration_data', 'nik_area_code.npy')
+AREA_CODE_DTYPE = np.dtype([('code', '<i4'), ('province', '<u2'), ('district', '<u2'), ('subdistrict', '<u2')])
+
+def names_path(path: str) -> str:
+    return os.path.splitext(path)[0] + '.names.json'
+
+def parse_code(code: str, length: int) -> Optional[int]:
+    return int(code) if len(code) == length and code.isdigit() else None
+
+class AreaCodeData:
+    """
+    Area code dataset in columns, one row per kecamatan sorted by code,
+    every name is an index into one table of interned strings
+    """
+    def __init__(self, rows: np.ndarray, names: Tuple[str, ...]):
+        self.rows = rows
+        self.names = names
+
+    @classmethod
+    def from_csv(cls, path: str = AREA_CODE_CSV) -> 'AreaCodeData':
+        names: List[str] = list()
+        name_indexes: Dict[str, int] = dict()
+
+        def name_index(name: str) -> int:
+            if (name := name.upper()) not in name_indexes:
+                name_indexes[name] = len(names)
+                names.append(sys.intern(name))
+            return name_indexes[name]
+
+        rows = list()
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                if (code := parse_code(row['kodewilayah'], 6)) is not None:
+                    rows.append((code, name_index(row['provinsi']), name_index(row['kabupatenkota']), name_index(row['kecamatan'])))
+
+        return cls(np.array(sorted(rows), dtype=AREA_CODE_DTYPE), tuple(names))
+
+    @classmethod
+    def from_binary(cls, path: str = AREA_CODE_BINARY) -> 'AreaCodeData':
+        with open(names_path(path)) as f:
+            names = tuple(sys.intern(name) for name in json.load(f))
+        return cls(np.load(path, mmap_mode='r'), names)
+
+    def save(self, path: str = AREA_CODE_BINARY) -> None:
+        # replaced atomically, a running process may have the old file mapped
+        with open(f"{names_path(path)}.tmp", 'w') as f:
+            json.dump(list(self.names), f)
+        with open(f"{path}.tmp", 'wb') as f:
+            np.save(f, np.asarray(self.rows))
+
+        os.replace(f"{names_path(path)}.tmp", names_path(path))
+        os.replace(f"{path}.tmp", path)
+
+def build_binary(csv_path: str = AREA_CODE_CSV, path: str = AREA_CODE_BINARY) -> None:
+    AreaCodeData.from_csv(csv_path).save(path)
+
+class AreaCodeIndex:
+    """
+    Direct address arrays over the columnar dataset, the code itself is the position
+    so a province (2 digits), kabupaten (4 digits) or kecamatan (6 digits) lookup is
+    constant time without a python object per row. Read only once built.
+    """
+    def __init__(self, data: AreaCodeData):
+        self.data = data
+        codes = np.asarray(data.rows['code'])
+        # smallest integer that can hold a row number
+        dtype = np.int16 if len(codes) < np.iinfo(np.int16).max else np.int32
+
+        self.rows = np.full(10 ** 6, -1, dtype)
+        self.rows[codes] = np.arange(len(codes))
+
+        # rows are sorted by code, a kabupaten or province is a contiguous range of rows
+        self.district_ranges = self.build_ranges(codes // 100, 10 ** 4, dtype)
+        self.province_ranges = self.build_ranges(codes // 10 ** 4, 10 ** 2, dtype)
+
+        for array in [self.rows, self.district_ranges, self.province_ranges]:
+            array.flags.writeable = False
+
+    def build_ranges(self, prefixes: np.ndarray, size: int, dtype: type) -> np.ndarray:
+        ranges = np.full((size, 2), -1, dtype)
+        unique, starts, counts = np.unique(prefixes, return_index=True, return_counts=True)
+        ranges[unique, 0], ranges[unique, 1] = starts, starts + counts
+        return ranges
+
+    def name(self, row: int, column: str) -> str:
+        return self.data.names[self.data.rows[column][row]]
+
+    def province(self, code: str) -> Optional[str]:
+        if (parsed := parse_code(code, 2)) is None or (start := self.province_ranges[parsed, 0]) < 0:
+            return None
+        return self.name(start, 'province')
+
+    def district(self, code: str) -> Optional[Tuple[str, str]]:
+        """
+        :param code: Four digits kabupaten code
+        :return: (province, kabupaten) or None when not found
+        """
+        if (parsed := parse_code(code, 4)) is None or (start := self.district_ranges[parsed, 0]) < 0:
+            return None
+        return self.name(start, 'province'), self.name(start, 'district')
+
+    def subdistrict(self, code: str) -> Optional[Tuple[str, str, str]]:
+        """
+        :param code: Six digits kecamatan code, the first six digits of the nik
+        :return: (province, kabupaten, kecamatan) or None when not found
+        """
+        if (parsed := parse_code(code, 6)) is None or (row := self.rows[parsed]) < 0:
+            return None
+        return self.name(row, 'province'), self.name(row, 'district'), self.name(row, 'subdistrict')
+
+    def children_of(self, code: str) -> Tuple[str, ...]:
+        """
+        :param code: Province or kabupaten code
+        :return: Code of the kabupaten of a province or the kecamatan of a kabupaten
+        """
+        ranges = {2: self.province_ranges, 4: self.district_ranges}.get(len(code))
+        if ranges is None or (parsed := parse_code(code, len(code))) is None or (start := ranges[parsed, 0]) < 0:
+            return tuple()
+
+        codes = self.data.rows['code'][start:ranges[parsed, 1]]
+        if len(code) == 2:
+            return tuple(f"{x:04d}" for x in np.unique(codes // 100))
+        return tuple(f"{x:06d}" for x in codes)
+
+@functools.lru_cache(maxsize=1)
+def get_area_code_data() -> AreaCodeData:
+    # loaded on first use, the prebuilt binary when it exists
+    if os.path.exists(AREA_CODE_BINARY):
+        return AreaCodeData.from_binary(AREA_CODE_BINARY)
+    return AreaCodeData.from_csv(AREA_CODE_CSV)
+
+@functools.lru_cache(maxsize=1)
+def get_area_code_index() -> AreaCodeIndex:
+    return AreaCodeIndex(get_area_code_data())
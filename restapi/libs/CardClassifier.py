@@ -0,0 +1,43 @@
+import io, cv2
+import numpy as np
+from PIL import Image
+from typing import Dict, Optional
+
+class CardClassifier:
+    """
+    Tell the kind of card from its colour before ocr, ktp is printed on a blue
+    background and kis has a green header, a hue histogram of a thumbnail is enough
+    """
+    # opencv hue (0-179) of every card kind
+    hue_ranges: Dict[str, tuple] = {'ktp': (90, 130), 'kis': (40, 90)}
+
+    def __init__(self, min_ratio: float):
+        self.min_ratio = min_ratio
+
+    def load_thumbnail(self, image: bytes) -> np.ndarray:
+        with Image.open(io.BytesIO(image)) as img:
+            # jpeg can be decoded at reduced scale, the colour doesn't need the detail
+            img.draft('RGB', (160, 160))
+            img = img.convert('RGB')
+            img.thumbnail((160, 160))
+            return np.asarray(img)
+
+    def color_ratios(self, image: bytes) -> Dict[str, float]:
+        hsv = cv2.cvtColor(self.load_thumbnail(image), cv2.COLOR_RGB2HSV)
+        hue, saturation, value = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+        # gray, white and dark pixel has no meaningful hue
+        colored = (saturation > 70) & (value > 60)
+
+        return {
+            kind: float(np.count_nonzero(colored & (hue >= low) & (hue < high)) / hue.size)
+            for kind, (low, high) in self.hue_ranges.items()
+        }
+
+    def classify(self, image: bytes) -> Optional[str]:
+        """
+        Kind of card in the image
+        :param image: Raw bytes of the upload
+        :return: ktp, kis or None when none of the card colour is found
+        """
+        kind, ratio = max(self.color_ratios(image).items(), key=lambda tup: tup[1])
+        return kind if ratio >= self.min_ratio else None
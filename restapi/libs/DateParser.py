@@ -0,0 +1,68 @@
+from typing import Iterator, List, Optional, Tuple
+
+DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+# year accepted on the card, both exclusive
+MIN_YEAR, MAX_YEAR = 1910, 2100
+
+def is_leap_year(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+def is_valid_date(day: int, month: int, year: int) -> bool:
+    if not MIN_YEAR < year < MAX_YEAR or not 1 <= month <= 12:
+        return False
+
+    last_day = 29 if month == 2 and is_leap_year(year) else DAYS_IN_MONTH[month]
+    return 1 <= day <= last_day
+
+def parse_window(digits: List[int], start: int) -> Optional[Tuple[int, int, int]]:
+    """
+    Read day, month and year from the 8 digits window at start,
+    day and month take two digits when the two digits are valid
+    :param digits: Value of every digit character
+    :param start: Position of the window
+    :return: (day, month, year) or None when the window is not a valid date
+    """
+    end = min(start + 8, len(digits))
+    if end - start < 6:
+        return None
+
+    position = start
+    if 1 <= (day := digits[position] * 10 + digits[position + 1]) <= 31:
+        position += 2
+    elif 1 <= (day := digits[position]) <= 9:
+        position += 1
+    else:
+        return None
+
+    if 1 <= (month := digits[position] * 10 + digits[position + 1]) <= 12:
+        position += 2
+    elif 1 <= (month := digits[position]) <= 9:
+        position += 1
+    else:
+        return None
+
+    # the rest of the window is the year
+    if end - position != 4:
+        return None
+
+    year = digits[position] * 1000 + digits[position + 1] * 100 + digits[position + 2] * 10 + digits[position + 3]
+    return (day, month, year) if is_valid_date(day, month, year) else None
+
+def iter_digit_dates(digit_string: str) -> Iterator[Tuple[int, int, int]]:
+    digits = [ord(x) - 48 for x in digit_string]
+    for start in range(len(digits) - 5):
+        if date := parse_window(digits, start):
+            yield date
+
+def parse_digit_date(digit_string: str) -> Optional[str]:
+    """
+    First valid date of a string of digits, e.g "17081990" or "1781990"
+    :param digit_string: Ascii digits only
+    :return: Date with format dd-mm-yyyy
+    """
+    if date := next(iter_digit_dates(digit_string), None):
+        return format_date(*date)
+    return None
+
+def format_date(day: int, month: int, year: int) -> str:
+    return f"{day:02d}-{month:02d}-{year}"
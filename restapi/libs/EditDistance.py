@@ -0,0 +1,55 @@
+from functools import lru_cache
+from typing import Optional
+
+@lru_cache(maxsize=8192)
+def levenshtein(source: str, target: str, max_distance: Optional[int] = None) -> int:
+    """
+    Myers/Hyyro bit-parallel edit distance, a whole column of the dp matrix
+    is packed into the bits of an int so every char of source cost O(1) ops
+    :param source: First string
+    :param target: Second string
+    :param max_distance: Stop early and return max_distance + 1 once the distance cannot be lower
+    :return: Edit distance between source and target
+    """
+    # the shorter string is the bit pattern
+    if len(source) < len(target):
+        source, target = target, source
+
+    length_source, length_target = len(source), len(target)
+    if max_distance is not None and length_source - length_target > max_distance:
+        return max_distance + 1
+    if length_target == 0:
+        return length_source
+
+    # bitmask of every position of a char in the pattern
+    peq = dict()
+    for index, char in enumerate(target):
+        peq[char] = peq.get(char, 0) | (1 << index)
+
+    mask = (1 << length_target) - 1
+    last_bit = 1 << (length_target - 1)
+    vertical_positive, vertical_negative, score = mask, 0, length_target
+
+    for index, char in enumerate(source, 1):
+        eq = peq.get(char, 0)
+        xv = eq | vertical_negative
+        xh = (((eq & vertical_positive) + vertical_positive) ^ vertical_positive) | eq
+
+        horizontal_positive = vertical_negative | (~(xh | vertical_positive) & mask)
+        horizontal_negative = vertical_positive & xh
+
+        if horizontal_positive & last_bit: score += 1
+        elif horizontal_negative & last_bit: score -= 1
+
+        # top row of the matrix grows by one every column
+        horizontal_positive = ((horizontal_positive << 1) | 1) & mask
+        horizontal_negative = (horizontal_negative << 1) & mask
+
+        vertical_positive = horizontal_negative | (~(xv | horizontal_positive) & mask)
+        vertical_negative = horizontal_positive & xv
+
+        # the score can only drop by one for every remaining char
+        if max_distance is not None and score - (length_source - index) > max_distance:
+            return max_distance + 1
+
+    return score
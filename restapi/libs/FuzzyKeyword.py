@@ -0,0 +1,50 @@
+from libs import EditDistance
+from typing import Dict, List, Optional, Set, Tuple
+
+class SymmetricDeleteIndex:
+    """
+    SymSpell style fuzzy dictionary, deletes of every keyword are precomputed once
+    so a lookup only generate the deletes of the token instead of scanning every keyword
+    """
+    def __init__(self, keywords: List[str], max_distance: int):
+        self.max_distance = max_distance
+        # position of keyword, used to break a tie like the keyword list order
+        self.order = {keyword: index for index, keyword in enumerate(keywords)}
+        self.min_length = min(len(keyword) for keyword in keywords)
+        self.max_length = max(len(keyword) for keyword in keywords)
+
+        self.deletes: Dict[str, Set[str]] = dict()
+        for keyword in keywords:
+            for variant in self.generate_deletes(keyword):
+                self.deletes.setdefault(variant, set()).add(keyword)
+
+    def generate_deletes(self, word: str) -> Set[str]:
+        result, frontier = {word}, {word}
+        for _ in range(self.max_distance):
+            frontier = {x[:i] + x[i + 1:] for x in frontier for i in range(len(x))}
+            result |= frontier
+        return result
+
+    def lookup(self, token: str) -> Optional[Tuple[str, int]]:
+        """
+        Find the closest keyword of the token
+        :param token: Word to search
+        :return: (keyword, distance) within max_distance or None
+        """
+        # a token this short or long is never within max_distance
+        if not self.min_length - self.max_distance <= len(token) <= self.max_length + self.max_distance:
+            return None
+
+        candidates = set()
+        for variant in self.generate_deletes(token):
+            candidates |= self.deletes.get(variant, set())
+
+        result = None
+        for keyword in candidates:
+            distance = EditDistance.levenshtein(keyword, token, self.max_distance)
+            if distance > self.max_distance:
+                continue
+            if result is None or (distance, self.order[keyword]) < (result[1], self.order[result[0]]):
+                result = (keyword, distance)
+
+        return result
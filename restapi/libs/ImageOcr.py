@@ -1,92 +1,416 @@
 import numpy as np
-import re, os, cv2, pytesseract
-from datetime import datetime
-from typing import Optional
+import io, cv2
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from libs.OcrEngine import BaseOcrEngine, PytesseractEngine
+from libs import EditDistance
+from libs.FuzzyKeyword import SymmetricDeleteIndex
+from libs.ImageQuality import ImageQualityError
+from libs.OcrMetrics import StageTimer, timed
+from libs.DateParser import is_valid_date, parse_digit_date, format_date
+from libs.MrzParser import MRZ_WHITELIST, TD3_LENGTH, normalize_line, parse_td3
+from libs.OcrLine import (
+    OcrLine, STATUS_KEYWORDS, REGION_KEYWORDS, DIGIT_PATTERN, SPACED_DATE_PATTERN, UPPER_RUN_PATTERN,
+    tokenize_lines, clean_upper_text, clean_upper_punct_text, clean_alnum_text
+)
+from config import settings
+from typing import Optional, Union, Dict, List, Sequence, Tuple
 
 class BaseImageOcr:
-    base_dir: str = os.path.join(os.path.dirname(__file__),'../static/identity_ocr/')
-
-    def levenshtein(self, source: str, target: str) -> int:
-        if len(source) < len(target):
-            return self.levenshtein(target, source)
-
-        # So now we have len(source) >= len(target).
-        if len(target) == 0:
-            return len(source)
-
-        # We call tuple() to force strings to be used as sequences
-        # ('c', 'a', 't', 's') - numpy uses them as values by default.
-        source = np.array(tuple(source))
-        target = np.array(tuple(target))
-
-        # We use a dynamic programming algorithm, but with the
-        # added optimization that we only need the last two rows
-        # of the matrix.
-        previous_row = np.arange(target.size + 1)
-        for s in source:
-            # Insertion (target grows longer than source):
-            current_row = previous_row + 1
-
-            # Substitution or matching:
-            # Target and source items are aligned, and either
-            # are different (cost of 1), or are the same (cost of 0).
-            current_row[1:] = np.minimum(
-                current_row[1:],
-                np.add(previous_row[:-1], target != s)
-            )
+    # relative (x1, y1, x2, y2) band of every field on the card
+    field_bands: Dict[str, tuple] = dict()
+    # tesseract config of every field band
+    field_configs: Dict[str, dict] = dict()
+    # fields that decide whether the preprocess ladder escalate
+    key_fields: List[str] = ['nik','birth_date']
+    # preprocess of every ladder step, from the cheapest
+    ladder_steps: Dict[str, str] = {
+        'basic': 'preprocess_image',
+        'adaptive': 'preprocess_adaptive',
+        'deskew': 'preprocess_deskew',
+        'upscale': 'preprocess_upscale'
+    }
+
+    def __init__(self, engine: Optional[BaseOcrEngine] = None):
+        self.engine = engine or PytesseractEngine()
+        self.field_executor = None
+        # time of every stage of the current job, reset by the worker before a job
+        self.timer = StageTimer()
+        self.profile = settings.ocr_profiles[settings.ocr_default_profile]
+
+    def use_profile(self, name: Optional[str] = None) -> None:
+        # speed/accuracy trade-off of the current job, see Settings.ocr_profiles
+        self.profile = settings.ocr_profiles[name or settings.ocr_default_profile]
+
+    def tesseract_options(self) -> dict:
+        return {'lang': 'ind', 'oem': self.profile.oem, 'tessdata_dir': self.profile.tessdata_dir}
+
+    def exif_transpose(self, img: np.ndarray, orientation: int) -> np.ndarray:
+        # same transforms as PIL.ImageOps.exif_transpose
+        if orientation == 2: return cv2.flip(img, 1)
+        if orientation == 3: return cv2.rotate(img, cv2.ROTATE_180)
+        if orientation == 4: return cv2.flip(img, 0)
+        if orientation == 5: return cv2.transpose(img)
+        if orientation == 6: return cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
+        if orientation == 7: return cv2.flip(cv2.transpose(img), -1)
+        if orientation == 8: return cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
+        return img
+
+    @timed('decode')
+    def read_image(self, image: Union[bytes, np.ndarray]) -> np.ndarray:
+        """
+        Decode an uploaded image in memory, the image never touch the disk
+        :param image: Raw bytes of the upload or an already decoded BGR array
+        :return: BGR array with exif orientation applied
+        """
+        if isinstance(image, np.ndarray):
+            return image
+
+        img = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+        if img is None:
+            raise ValueError("Cannot identify the image.")
+
+        # pillow only parse the header here, pixel data is not decoded twice
+        try:
+            with Image.open(io.BytesIO(image)) as pil_img:
+                orientation = pil_img.getexif().get(0x0112, 1)
+        except Exception:
+            orientation = 1
+
+        return self.exif_transpose(img, orientation)
+
+    def order_corners(self, corners: np.ndarray) -> np.ndarray:
+        # top-left, top-right, bottom-right, bottom-left
+        rect = np.zeros((4, 2), dtype="float32")
+        total, diff = corners.sum(axis=1), np.diff(corners, axis=1)
+        rect[0] = corners[np.argmin(total)]
+        rect[1] = corners[np.argmin(diff)]
+        rect[2] = corners[np.argmax(total)]
+        rect[3] = corners[np.argmax(diff)]
+        return rect
+
+    @timed('detect')
+    def detect_card(self, img: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Find the quadrilateral of the card with contour detection
+        :param img: BGR array of the photo
+        :return: Ordered corners in the coordinate of img or None when no card found
+        """
+        # contour search doesn't need the full resolution
+        height, width = img.shape[:2]
+        ratio = max(width / 500, 1)
+        small = cv2.resize(img, (int(width / ratio), int(height / ratio)), interpolation=cv2.INTER_AREA)
+
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        # close the gaps so the card border become one contour
+        edged = cv2.morphologyEx(cv2.Canny(gray, 30, 100), cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+
+        contours = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:3]:
+            hull = cv2.convexHull(contour)
+            if cv2.contourArea(hull) < 0.2 * small.shape[0] * small.shape[1]:
+                break
+
+            # rounded corner of the card need a coarser approximation
+            for epsilon in [0.02, 0.04, 0.06, 0.08]:
+                approx = cv2.approxPolyDP(hull, epsilon * cv2.arcLength(hull, True), True)
+                if len(approx) <= 4: break
+            if len(approx) != 4:
+                continue
+
+            corners = self.order_corners(approx.reshape(4, 2).astype("float32"))
+            card_width = np.linalg.norm(corners[1] - corners[0])
+            card_height = np.linalg.norm(corners[3] - corners[0])
+            # id card is landscape with ratio 85.6 x 54 mm
+            if card_height > 0 and 1.3 <= card_width / card_height <= 1.9:
+                return corners * ratio
+
+        return None
+
+    @timed('normalize')
+    def normalize_card(self, img: np.ndarray, corners: Optional[np.ndarray] = None) -> np.ndarray:
+        width, height = int(settings.ocr_card_width * self.profile.scale), int(settings.ocr_card_height * self.profile.scale)
+
+        if corners is not None:
+            target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype="float32")
+            matrix = cv2.getPerspectiveTransform(corners, target)
+            return cv2.warpPerspective(img, matrix, (width, height))
+
+        # no card found, only downscale the photo
+        scale = settings.ocr_max_image_side * self.profile.scale / max(img.shape[:2])
+        if scale < 1:
+            return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        return img
+
+    @timed('quality')
+    def check_image_quality(self, img: np.ndarray, corners: Optional[np.ndarray], card: np.ndarray) -> None:
+        """
+        Reject photo that can't be read before spending time on tesseract
+        :param img: BGR array of the photo
+        :param corners: Corners of the card in the photo or None when no card found
+        :param card: Normalized card of the photo
+        :raise ImageQualityError: When the card is too small, blurry or has glare
+        """
+        if corners is not None:
+            card_side = min(np.linalg.norm(corners[1] - corners[0]), np.linalg.norm(corners[3] - corners[0]))
+        else:
+            card_side = min(img.shape[:2])
+
+        if card_side < settings.ocr_quality_min_side:
+            raise ImageQualityError('too_small')
+
+        # measure on small image so the score doesn't depend on the photo resolution
+        width = min(card.shape[1], 500)
+        small = cv2.resize(card, (width, int(card.shape[0] * width / card.shape[1])), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        if cv2.Laplacian(gray, cv2.CV_64F).var() < settings.ocr_quality_min_sharpness:
+            raise ImageQualityError('blurry')
+
+        if self.measure_glare(small, gray) > settings.ocr_quality_max_glare:
+            raise ImageQualityError('glare')
+
+    def measure_glare(self, img: np.ndarray, gray: np.ndarray) -> float:
+        """
+        Largest saturated blob that sit on the print of the card. A white card washed
+        out by the exposure is saturated too, but it is surrounded by the same light
+        paper and its text is still readable, so that blob is not glare.
+        :param img: BGR array of the card, at most 500 pixels wide
+        :param gray: Grayscale of img
+        :return: Area of the largest glare blob relative to the card
+        """
+        saturation = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)[..., 1]
+        paper = (gray >= 225) & (saturation < 25)
+
+        # drop the single saturated pixels of the jpeg noise
+        mask = cv2.morphologyEx((gray >= 250).astype(np.uint8), cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+        for label in np.argsort(-stats[1:, cv2.CC_STAT_AREA]) + 1:
+            x, y, w, h, area = stats[label]
+            if area / gray.size <= 0.002:
+                break
+
+            # ring around the blob, past the falloff of the highlight
+            top, left = max(y - 12, 0), max(x - 12, 0)
+            blob = (labels[top:y + h + 12, left:x + w + 12] == label).astype(np.uint8)
+            ring = (cv2.dilate(blob, np.ones((25, 25), np.uint8)) > 0) & (cv2.dilate(blob, np.ones((7, 7), np.uint8)) == 0)
+            if ring.any() and paper[top:y + h + 12, left:x + w + 12][ring].mean() < 0.35:
+                return area / gray.size
+
+        return 0.0
+
+    def load_card(self, image: Union[bytes, np.ndarray], check_quality: bool = True) -> np.ndarray:
+        img = self.read_image(image)
+        corners = self.detect_card(img) if settings.ocr_card_detection else None
+        card = self.normalize_card(img, corners)
+
+        if settings.ocr_quality_gate and check_quality:
+            self.check_image_quality(img, corners, card)
+
+        return card
+
+    def preprocess_image(self, img: np.ndarray) -> np.ndarray:
+        # convert the image to grayscale and blur sligthly
+        blur = cv2.medianBlur(img, 3)
+        gray = cv2.cvtColor(blur, cv2.COLOR_BGR2GRAY)
 
-            # Deletion (target grows shorter than source):
-            current_row[1:] = np.minimum(
-                current_row[1:],
-                current_row[0:-1] + 1
+        # threshold image
+        _, threshed = cv2.threshold(gray, 127, 255, cv2.THRESH_TRUNC)
+
+        return threshed
+
+    def preprocess_adaptive(self, img: np.ndarray) -> np.ndarray:
+        # local threshold handle shadow and uneven light of the photo
+        gray = cv2.cvtColor(cv2.medianBlur(img, 3), cv2.COLOR_BGR2GRAY)
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+
+    def estimate_skew(self, img: np.ndarray) -> float:
+        """
+        Estimate the rotation of the text with projection profile, at the right angle
+        the row histogram of the text pixels change the sharpest between lines
+        :param img: BGR array of the card
+        :return: Angle in degree, positive when the text is rotated counter-clockwise
+        """
+        scale = min(500 / img.shape[1], 1)
+        gray = cv2.cvtColor(cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 15, 10)
+        # drop the speckle of the card background pattern
+        binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+
+        # project the pixel coordinates instead of rotating the image, no interpolation bias
+        ys, xs = np.nonzero(binary)
+        ys, xs = ys.astype(np.float64), xs - binary.shape[1] / 2
+        if len(ys) == 0:
+            return 0.0
+
+        def score(angle: float) -> float:
+            radian = np.radians(angle)
+            rows = np.round(ys * np.cos(radian) + xs * np.sin(radian)).astype(np.int64)
+            return float(np.sum(np.diff(np.bincount(rows - rows.min())) ** 2))
+
+        # coarse search then refine around the best angle
+        best = max(np.arange(-10, 10.25, 0.5), key=score)
+        best = max(np.arange(best - 0.5, best + 0.55, 0.1), key=score)
+
+        return float(best)
+
+    def deskew(self, img: np.ndarray) -> np.ndarray:
+        if abs(angle := self.estimate_skew(img)) < 0.3:
+            return img
+
+        height, width = img.shape[:2]
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), -angle, 1.0)
+        return cv2.warpAffine(img, matrix, (width, height), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+    def preprocess_deskew(self, img: np.ndarray) -> np.ndarray:
+        return self.preprocess_adaptive(self.deskew(img))
+
+    def preprocess_upscale(self, img: np.ndarray) -> np.ndarray:
+        # tesseract read small text better when the glyph is around 30px high
+        return self.preprocess_adaptive(cv2.resize(self.deskew(img), None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC))
+
+    @timed('tesseract')
+    def image_to_lines(self, threshed: np.ndarray) -> Tuple[List[str], List[float]]:
+        """
+        Ocr the image into lines of text
+        :param threshed: Preprocessed image
+        :return: Text of every line and the mean confidence of its words
+        """
+        lines, confidences = list(), list()
+        for words in self.engine.image_to_data(threshed, **self.tesseract_options()):
+            text = " ".join(word for word, _ in words)
+            if len(text) > 2:
+                lines.append(text)
+                confidences.append(sum(max(conf, 0) for _, conf in words) / len(words))
+
+        return lines, confidences
+
+    def extract_lines_to_text(self, lines: List[OcrLine], debug: Optional[bool] = None) -> Tuple[dict, dict]:
+        """
+        Resolve the entities of the card from the ocr lines
+        :return: Value of every field and the index of the line it came from
+        """
+        raise NotImplementedError
+
+    def extract_with_ladder(self, img: np.ndarray, debug: Optional[bool] = None) -> dict:
+        """
+        Run the cheapest preprocess first, escalate to the heavier one only when
+        a key field is missing or read with low confidence
+        :param img: Normalized card
+        :return: Best result with the ladder step that produced it
+        """
+        best = None
+        for step in self.profile.ladder_steps or settings.ocr_ladder_steps:
+            with self.timer.stage('preprocess'):
+                threshed = getattr(self, self.ladder_steps[step])(img)
+            texts, confidences = self.image_to_lines(threshed)
+            result, indexes = self.extract_lines_to_text(tokenize_lines(texts), debug)
+
+            found = [field for field in self.key_fields if result[field]]
+            confident = [field for field in found if confidences[indexes[field]] >= settings.ocr_min_confidence]
+            score = (len(confident), len(found), sum(confidences[indexes[field]] for field in found))
+
+            if debug:
+                print(f"STEP {step} -> ", score)
+
+            if best is None or score > best[0]:
+                best = (score, {**result, 'ocr_step': step})
+            if len(confident) == len(self.key_fields):
+                break
+
+        return best[1]
+
+    def crop_band(self, img: np.ndarray, band: tuple) -> np.ndarray:
+        height, width = img.shape[:2]
+        x1, y1, x2, y2 = band
+        return img[int(y1 * height):int(y2 * height), int(x1 * width):int(x2 * width)]
+
+    @timed('tesseract')
+    def fields_to_text(self, threshed: np.ndarray, fields: list) -> Dict[str, str]:
+        """
+        Ocr only the band of the given fields, every band run in parallel
+        :param threshed: Preprocessed image of the whole card
+        :param fields: Name of field in field_bands
+        :return: Raw text of every field
+        """
+        if self.field_executor is None:
+            self.field_executor = ThreadPoolExecutor(max_workers=settings.ocr_field_threads)
+
+        jobs = {
+            field: self.field_executor.submit(
+                self.engine.image_to_string,
+                self.crop_band(threshed, self.field_bands[field]),
+                **{**self.tesseract_options(), **self.field_configs[field]}
             )
+            for field in fields
+        }
 
-            previous_row = current_row
+        return {field: job.result().strip() for field, job in jobs.items()}
+
+    def extract_nik_to_text(
+        self,
+        image: Union[bytes, np.ndarray],
+        debug: Optional[bool] = None,
+        profile: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Ocr only the nik band of the card with a digit whitelist,
+        much cheaper than reading the whole card
+        :param image: Raw bytes of the upload or an already decoded BGR array
+        :param profile: Name of Settings.ocr_profiles, default profile when None
+        :return: Nik with 16 digits or None when the band cannot be read
+        """
+        self.use_profile(profile)
+        img = self.load_card(image)
+        with self.timer.stage('preprocess'):
+            threshed = self.preprocess_image(img)
+        text = self.fields_to_text(threshed, ['nik'])['nik']
 
-        return previous_row[-1]
+        if debug:
+            print("NIK BAND -> ", text)
 
-    def get_percentage_contain_text(self, regex: str, data_string: str) -> float:
-        upper_char = len(" ".join(re.findall(regex, data_string)))
-        total_char = len(data_string)
-        return (upper_char / total_char) * 100
+        # the band can catch the line around the nik, the longest run of digit is the nik
+        digits = max([DIGIT_PATTERN.sub('', line) for line in text.split('\n')], key=len)
+        return digits if len(digits) == 16 else None
+
+    def levenshtein(self, source: str, target: str, max_distance: Optional[int] = None) -> int:
+        return EditDistance.levenshtein(source, target, max_distance)
 
 class ImageOcrKTP(BaseImageOcr):
-    def change_wrong_digit_nik(self, character: str) -> str:
-        character = character.replace("NIK","")
-        character = character.replace("U","0")
-        character = character.replace("O","0")
-        character = character.replace("D","0")
-        character = character.replace("N","0")
-
-        character = character.replace("L","1")
-        character = character.replace(")","1")
-        character = character.replace("C","2")
-
-        character = character.replace("Y","4")
-        character = character.replace("H","4")
-        character = character.replace("S","5")
-        character = character.replace("b","6")
-        character = character.replace("?","7")
-        character = character.replace("A","8")
-        character = character.replace("I","9")
-
-        return character
-
-    def change_wrong_digit_date(self, character: str) -> str:
-        character = character.replace("/","7")
-        return character
-
-    def get_nik_entity(self, data: list) -> tuple:
+    # relative to the card after normalize_card
+    field_bands: Dict[str, tuple] = {
+        'nik': (0.22, 0.12, 0.72, 0.23),
+        'name': (0.26, 0.22, 0.72, 0.29),
+        'birth_place': (0.26, 0.27, 0.72, 0.335),
+        'birth_date': (0.40, 0.27, 0.72, 0.335),
+        'gender': (0.26, 0.315, 0.50, 0.375),
+        'address': (0.26, 0.355, 0.72, 0.455)
+    }
+    field_configs: Dict[str, dict] = {
+        'nik': {'psm': 7, 'whitelist': '0123456789'},
+        'name': {'psm': 7},
+        'birth_place': {'psm': 7},
+        'birth_date': {'psm': 7, 'whitelist': '0123456789-'},
+        'gender': {'psm': 7},
+        'address': {'psm': 6}
+    }
+    gender_index = SymmetricDeleteIndex(
+        ['laki-laki','laki','perempuan','wanita'],
+        max_distance=settings.ocr_fuzzy_max_distance
+    )
+
+    @timed('extract_nik')
+    def get_nik_entity(self, lines: List[OcrLine]) -> tuple:
         data_filter = list()
-        for index, text in enumerate(data):
-            # change wrong digit
-            text = "".join(re.findall(r"[0-9]{2,}.*", self.change_wrong_digit_nik(text)))
-
-            is_digit = len([x for x in text if x.isdigit()])
-            is_char = len([x for x in text if not x.isdigit()])
+        for line in lines:
+            # digit count of the text after wrong digit fixed
+            is_digit = line.nik_digit_count
+            is_char = len(line.nik_text) - line.nik_digit_count
 
             if is_digit > 10 and is_digit < 25:
-                data_filter.append((is_digit,is_char,text,index))
+                data_filter.append((is_digit,is_char,line.nik_text,line.index))
 
         if len(data_filter) < 1:
             return (None, None)
@@ -99,89 +423,97 @@ class ImageOcrKTP(BaseImageOcr):
         if result[0] < 14:
             return (None, None)
 
-        return (re.sub('[^0-9]','', result[-2]), result[-1])
+        return (DIGIT_PATTERN.sub('', result[-2]), result[-1])
 
-    def get_gender_entity(self, data: list, date_index: int) -> tuple:
-        for index, value in enumerate(data):
-            if 'laki' in value.lower():
-                return ('LAKI-LAKI', index)
-            if 'perempuan' in value.lower() or 'wanita' in value.lower():
-                return ('PEREMPUAN', index)
+    @timed('extract_gender')
+    def get_gender_entity(self, lines: List[OcrLine], date_index: int) -> tuple:
+        for line in lines:
+            if 'laki' in line.keywords:
+                return ('LAKI-LAKI', line.index)
+            if 'perempuan' in line.keywords or 'wanita' in line.keywords:
+                return ('PEREMPUAN', line.index)
 
         if date_index is None: return (None, None)
 
         try:
-            list_gender = ['laki-laki','laki','perempuan','wanita']
-            contain_gender = re.findall(r"\b[A-Z]{3,}\b", data[date_index + 1])
-
-            guest_gender = [
-                (self.levenshtein(gender, x.lower()), gender) for x in contain_gender for gender in list_gender
-            ]
-            guest_gender.sort(key=lambda tup: tup[0])
-            guest_gender = guest_gender[0]
-
-            if guest_gender[-1] == 'laki-laki' or guest_gender[-1] == 'laki':
-                return ('LAKI-LAKI', date_index + 1)
-            if guest_gender[-1] == 'perempuan' or guest_gender[-1] == 'wanita':
-                return ('PEREMPUAN', date_index + 1)
+            if gender := self.guess_gender(lines[date_index + 1].upper_tokens):
+                return (gender, date_index + 1)
         except Exception:
             pass
 
         return (None, None)
 
-    def get_address_entity(self, data: list, gender_index: int) -> tuple:
+    def guess_gender(self, tokens: Sequence[str]) -> Optional[str]:
+        guest_gender = list()
+        for word in tokens:
+            if found := self.gender_index.lookup(word.lower()):
+                guest_gender.append((found[1], found[0]))
+
+        if len(guest_gender) < 1:
+            return None
+
+        guest_gender.sort(key=lambda tup: tup[0])
+        guest_gender = guest_gender[0]
+
+        if guest_gender[-1] == 'laki-laki' or guest_gender[-1] == 'laki':
+            return 'LAKI-LAKI'
+        if guest_gender[-1] == 'perempuan' or guest_gender[-1] == 'wanita':
+            return 'PEREMPUAN'
+
+    def is_address_line(self, line: OcrLine) -> bool:
+        return line.text_ratio >= line.number_ratio and not line.keywords & STATUS_KEYWORDS
+
+    @timed('extract_address')
+    def get_address_entity(self, lines: List[OcrLine], gender_index: int) -> tuple:
         index_one = gender_index + 1 if gender_index else None
         for x in ['Gol','Darah','Alamat']:
-            for i,v in enumerate(data):
-                if x in v and len(v.split()) > 1: index_one = i if x == 'Alamat' else i + 1
+            for line in lines:
+                if x in line.keywords and len(line.words) > 1: index_one = line.index if x == 'Alamat' else line.index + 1
 
         if index_one is not None:
             result, index_two = None, index_one + 1
 
             try:
-                percentage_char = self.get_percentage_contain_text("[A-Z/.,]+",data[index_one])
-                percentage_num = self.get_percentage_contain_text("[0-9]+",data[index_one])
-                found_word = re.findall(r"(\b(RT|RW|RTRW|KAWIN|BELUM|CERAI|HIDUP|MATI)\b)", data[index_one])
-                if percentage_char >= percentage_num and len(found_word) == 0:
-                    result = data[index_one]
+                if self.is_address_line(lines[index_one]):
+                    result = lines[index_one].text
             except Exception:
                 return (None, None)
 
             # get address below
             try:
-                percentage_char = self.get_percentage_contain_text("[A-Z/.,]+",data[index_two])
-                percentage_num = self.get_percentage_contain_text("[0-9]+",data[index_two])
-                found_word = re.findall(r"(\b(RT|RW|RTRW|KAWIN|BELUM|CERAI|HIDUP|MATI)\b)", data[index_two])
-                if percentage_char >= percentage_num and len(found_word) == 0:
-                    result = "{} {}".format(result,data[index_two])
+                if self.is_address_line(lines[index_two]):
+                    result = "{} {}".format(result,lines[index_two].text)
             except Exception:
                 pass
 
             if result:
-                result = " ".join(re.findall(r"([A-Z0-9/.,]{2,}.*)", result))
-                return (" ".join(re.findall("[A-Z0-9/.,]+", result)), index_one)
+                return (clean_alnum_text(result), index_one)
 
         return (None, None)
 
-    def get_birth_place_entity(self, data: list, gender_index: int, date_index: int) -> tuple:
+    @timed('extract_birth_place')
+    def get_birth_place_entity(self, lines: List[OcrLine], gender_index: int, date_index: int) -> tuple:
         index = gender_index or date_index
         if index and index == gender_index: index = index - 1
 
         try:
-            if len(re.findall(r"([A-Z]{2,})", data[index])) == 0: index = index - 1
-            if len(re.findall(r"([A-Z]{2,})", data[index])) == 0: return (None, None)
+            if lines[index].upper_word_count == 0: index = index - 1
+            if lines[index].upper_word_count == 0: return (None, None)
 
-            result = " ".join(re.findall(r"[A-Z]{1,}[^a-z].*", data[index]))
-            return (" ".join(re.findall("[A-Z]+", result)), index)
+            return (clean_upper_text(lines[index].text), index)
         except Exception:
             pass
 
         return (None, None)
 
-    def get_name_entity(self, data: list, nik_index: int, birth_place_index: int) -> tuple:
+    def is_name_line(self, line: OcrLine) -> bool:
+        return line.upper_word_count != 0 and not line.keywords & REGION_KEYWORDS
+
+    @timed('extract_name')
+    def get_name_entity(self, lines: List[OcrLine], nik_index: int, birth_place_index: int) -> tuple:
         index_one, index_two, found_in = None, None, None
 
-        if result := [i for i,v in enumerate(data) if len(re.findall(r"([A-Z]{2,})", v)) != 0 and 'nama' in v.lower()]:
+        if result := [line.index for line in lines if line.upper_word_count != 0 and 'nama' in line.keywords]:
             index_one = result[0]
             found_in = 'nama'
 
@@ -189,8 +521,7 @@ class ImageOcrKTP(BaseImageOcr):
             if (
                 index_one is None and
                 birth_place_index is not None and
-                len(re.findall(r"([A-Z]{2,})", data[birth_place_index - 1])) != 0 and
-                len(re.findall(r"(\b(PROVINSI|KOTA|KABUPATEN)\b)", data[birth_place_index - 1])) == 0
+                self.is_name_line(lines[birth_place_index - 1])
             ):
                 index_one = birth_place_index - 1
                 found_in = 'birth_place'
@@ -201,8 +532,7 @@ class ImageOcrKTP(BaseImageOcr):
             if (
                 index_one is None and
                 nik_index is not None and
-                len(re.findall(r"([A-Z]{2,})", data[nik_index + 1])) != 0 and
-                len(re.findall(r"(\b(PROVINSI|KOTA|KABUPATEN)\b)", data[nik_index + 1])) == 0
+                self.is_name_line(lines[nik_index + 1])
             ):
                 index_one = nik_index + 1
                 found_in = 'nik'
@@ -215,9 +545,8 @@ class ImageOcrKTP(BaseImageOcr):
             if (
                 found_in in ['nama','nik'] and
                 index_one + 1 != birth_place_index and
-                self.get_percentage_contain_text("[A-Z]+",data[index_one + 1]) > 60 and
-                len(re.findall(r"([A-Z]{2,})", data[index_one + 1])) != 0 and
-                len(re.findall(r"(\b(PROVINSI|KOTA|KABUPATEN)\b)", data[index_one + 1])) == 0
+                lines[index_one + 1].upper_ratio > 60 and
+                self.is_name_line(lines[index_one + 1])
             ):
                 index_two = index_one + 1
         except Exception:
@@ -227,124 +556,97 @@ class ImageOcrKTP(BaseImageOcr):
             if (
                 found_in == 'birth_place' and
                 index_one - 1 != nik_index and
-                self.get_percentage_contain_text("[A-Z]+",data[index_one - 1]) > 60 and
-                len(re.findall(r"([A-Z]{2,})", data[index_one - 1])) != 0 and
-                len(re.findall(r"(\b(PROVINSI|KOTA|KABUPATEN)\b)", data[index_one - 1])) == 0
+                lines[index_one - 1].upper_ratio > 60 and
+                self.is_name_line(lines[index_one - 1])
             ):
                 index_two = index_one - 1
         except Exception:
             pass
 
         try:
-            result = data[index_one]
+            result = lines[index_one].text
 
             if found_in == 'birth_place' and index_two is not None:
-                result = "{} {}".format(data[index_two],data[index_one])
+                result = "{} {}".format(lines[index_two].text,lines[index_one].text)
 
             if found_in in ['nama','nik'] and index_two is not None:
-                result = "{} {}".format(data[index_one],data[index_two])
+                result = "{} {}".format(lines[index_one].text,lines[index_two].text)
 
             if result:
-                result = " ".join(re.findall(r"[A-Z]{1,}[^a-z].*", result))
-                return (" ".join(re.findall("[A-Z]+", result)), index_one)
+                return (clean_upper_text(result), index_one)
         except Exception:
             pass
 
         return (None, None)
 
-    def extract_valid_date(self, date_string: str) -> str:
-        for i in range(len(date_string)):
-            guest_date = date_string[i:i + 8]
-            if len(guest_date) >= 6:
-                day, month, year = None, None, None
-
-                for i in reversed(range(1,3)):
-                    try:
-                        day = datetime.strptime(guest_date[0:i],'%d')
-                        guest_date = guest_date[i:]
-                        break
-                    except Exception:
-                        pass
-
-                if day is None:
-                    continue
-
-                day = day.strftime('%d')
-
-                for i in reversed(range(1,3)):
-                    try:
-                        month = datetime.strptime(guest_date[0:i],'%m')
-                        guest_date = guest_date[i:]
-                        break
-                    except Exception:
-                        pass
-
-                if month is None:
-                    continue
-
-                month = month.strftime('%m')
-
-                try:
-                    year = datetime.strptime(guest_date,'%Y')
-                except Exception:
-                    continue
-
-                year = year.strftime('%Y')
-
-                if int(year) > 1910 and int(year) < 2100:
-                    return f"{day}-{month}-{year}"
-
-        return None
-
-    def extract_date(self, data: list) -> tuple:
-        contain_digit = [
-            (re.sub("[^0-9]", "", value), index) for index, value
-            in enumerate([self.change_wrong_digit_date(x) for x in data])
-            if len(re.sub("[^0-9]", "", value)) > 5
-        ]
-
-        if len(contain_digit) < 1:
-            return (None, None)
-
+    @timed('extract_birth_date')
+    def extract_date(self, lines: List[OcrLine]) -> tuple:
+        # first valid date of every line, the oldest year is the birth date
         valid_format_date = [
-            (self.extract_valid_date(guest[0]),guest[1])
-            for guest in contain_digit if self.extract_valid_date(guest[0])
+            (date, line.index) for line in lines
+            if len(line.date_digits) > 5 and (date := parse_digit_date(line.date_digits))
         ]
 
         if len(valid_format_date) < 1:
             return (None, None)
 
-        valid_format_date.sort(key=lambda tup: datetime.strptime(tup[0],'%d-%m-%Y').year)
+        valid_format_date.sort(key=lambda tup: int(tup[0][-4:]))
 
         return valid_format_date[0]
 
-    def extract_image_to_text(self, image: str, debug: Optional[bool] = None) -> dict:
-        path = os.path.join(self.base_dir,'ktp',image)
+    def extract_fields_to_text(self, threshed: np.ndarray, debug: Optional[bool] = None) -> Optional[dict]:
+        texts = self.fields_to_text(threshed, list(self.field_bands.keys()))
+        # drop the label that get into the band, e.g "Nama :"
+        values = {k: v.split(':')[-1].strip() for k,v in texts.items()}
 
-        # read img
-        img = cv2.imread(path)
+        nik = DIGIT_PATTERN.sub('', values['nik'])
+        nik = nik if len(nik) >= 14 else None
 
-        # convert the image to grayscale and blur sligthly
-        blur = cv2.medianBlur(img, 3)
-        gray = cv2.cvtColor(blur, cv2.COLOR_BGR2GRAY)
+        name = clean_upper_text(values['name'])
 
-        # threshold image
-        _, threshed = cv2.threshold(gray, 127, 255, cv2.THRESH_TRUNC)
+        # nik and name is the anchor of the layout, if both missing the band is wrong
+        if not nik and not name:
+            return None
 
-        # (3) Detect
-        result = pytesseract.image_to_string((threshed), lang="ind")
-        result = [x for x in [i.strip() for i in result.split('\n')] if len(x) > 2]
+        birth_place = " ".join(UPPER_RUN_PATTERN.findall(values['birth_place'].split(',')[0]))
+        date, _ = self.extract_date(tokenize_lines([values['birth_date'], values['birth_place']]))
 
-        date, date_index = self.extract_date(result)
-        nik, nik_index = self.get_nik_entity(result)
-        gender, gender_index = self.get_gender_entity(result,date_index)
-        address, address_index = self.get_address_entity(result,gender_index)
-        birth_place, birth_place_index = self.get_birth_place_entity(result,gender_index,date_index)
-        name, name_index = self.get_name_entity(result,nik_index,birth_place_index)
+        gender, gender_line = None, OcrLine(values['gender'])
+        if 'laki' in gender_line.keywords: gender = 'LAKI-LAKI'
+        elif 'perempuan' in gender_line.keywords or 'wanita' in gender_line.keywords: gender = 'PEREMPUAN'
+        else: gender = self.guess_gender(gender_line.upper_tokens)
+
+        address = [
+            line.text for line in tokenize_lines([i.strip() for i in texts['address'].split('\n')])
+            if len(line.text) > 2 and self.is_address_line(line)
+        ]
+        address = clean_alnum_text(" ".join(address).split(':')[-1])
 
         if debug:
             print("=" * 20)
-            print(result)
+            print(texts)
+            print("=" * 20)
+
+        return {
+            'nik': nik,
+            'name': name if name and len(name) > 1 else None,
+            'birth_date': date if date and len(date) > 1 else None,
+            'birth_place': birth_place if birth_place and len(birth_place) > 1 else None,
+            'gender': gender,
+            'address': address if address and len(address) > 1 else None
+        }
+
+    def extract_lines_to_text(self, lines: List[OcrLine], debug: Optional[bool] = None) -> Tuple[dict, dict]:
+        date, date_index = self.extract_date(lines)
+        nik, nik_index = self.get_nik_entity(lines)
+        gender, gender_index = self.get_gender_entity(lines,date_index)
+        address, address_index = self.get_address_entity(lines,gender_index)
+        birth_place, birth_place_index = self.get_birth_place_entity(lines,gender_index,date_index)
+        name, name_index = self.get_name_entity(lines,nik_index,birth_place_index)
+
+        if debug:
+            print("=" * 20)
+            print([line.text for line in lines])
             print("=" * 20)
 
             print("NAMA -> ",(name,name_index))
@@ -354,7 +656,7 @@ class ImageOcrKTP(BaseImageOcr):
             print("JENIS KELAMIN -> ",(gender,gender_index))
             print("ADDRESS -> ",(address,address_index))
 
-        return {
+        result = {
             'nik': nik if nik and len(nik) > 1 else None,
             'name': name if name and len(name) > 1 else None,
             'birth_date': date if date and len(date) > 1 else None,
@@ -362,49 +664,90 @@ class ImageOcrKTP(BaseImageOcr):
             'gender': gender if gender and len(gender) > 1 else None,
             'address': address if address and len(address) > 1 else None
         }
+        indexes = {
+            'nik': nik_index, 'name': name_index, 'birth_date': date_index,
+            'birth_place': birth_place_index, 'gender': gender_index, 'address': address_index
+        }
 
-class ImageOcrKIS(BaseImageOcr):
-    def change_wrong_character_name(self, character: str) -> str:
-        character = character.replace("|","I")
-        return character
+        return result, indexes
+
+    def extract_image_to_text(
+        self,
+        image: Union[bytes, np.ndarray],
+        debug: Optional[bool] = None,
+        layout: Optional[str] = None,
+        check_quality: bool = True,
+        profile: Optional[str] = None
+    ) -> dict:
+        self.use_profile(profile)
+        # read img
+        img = self.load_card(image, check_quality)
+
+        if (layout or settings.ocr_ktp_layout) == 'fields':
+            with self.timer.stage('preprocess'):
+                threshed = self.preprocess_image(img)
+            if result := self.extract_fields_to_text(threshed, debug):
+                return {**result, 'ocr_step': 'fields'}
 
-    def get_no_card_entity(self, data: list) -> tuple:
-        if result := [(v,i,len(re.sub("[^0-9]", "", v))) for i,v in enumerate(data) if len(re.sub("[^0-9]", "", v)) > 10]:
+        return self.extract_with_ladder(img, debug)
+
+class ImageOcrKIS(BaseImageOcr):
+    months: Dict[str, str] = {
+        'januari': '01', 'februari': '02',
+        'maret': '03', 'april': '04',
+        'mei': '05', 'juni': '06',
+        'juli': '07', 'agustus': '08',
+        'september': '09', 'oktober': '10',
+        'november': '11', 'desember': '12'
+    }
+    month_index = SymmetricDeleteIndex(list(months.keys()), max_distance=settings.ocr_fuzzy_max_distance)
+    # the kis layout often isn't warped by detect_card, so the band cover the line around the nik
+    field_bands: Dict[str, tuple] = {
+        'nik': (0.20, 0.64, 0.60, 0.80)
+    }
+    field_configs: Dict[str, dict] = {
+        'nik': {'psm': 6, 'whitelist': '0123456789'}
+    }
+
+    @timed('extract_no_card')
+    def get_no_card_entity(self, lines: List[OcrLine]) -> tuple:
+        if result := [(line.digits,line.index,len(line.digits)) for line in lines if len(line.digits) > 10]:
             result.sort(key=lambda tup: tup[-1])
-            return (re.sub('[^0-9]','', result[0][0]), result[0][1])
+            return (result[0][0], result[0][1])
         return (None, None)
 
-    def get_nik_entity(self, data: list, no_card: str) -> tuple:
-        if result := [(v,i,len(re.sub("[^0-9]", "", v))) for i,v in enumerate(data) if len(re.sub("[^0-9]", "", v)) > 10]:
+    @timed('extract_nik')
+    def get_nik_entity(self, lines: List[OcrLine], no_card: str) -> tuple:
+        if result := [(line.digits,line.index,len(line.digits)) for line in lines if len(line.digits) > 10]:
             result.sort(key=lambda tup: tup[-1],reverse=True)
-            if re.sub('[^0-9]','', result[0][0]) != no_card:
-                return (re.sub('[^0-9]','', result[0][0]), result[0][1])
+            if result[0][0] != no_card:
+                return (result[0][0], result[0][1])
         return (None, None)
 
-    def get_name_entity(self, data: list, no_card_index: int) -> tuple:
+    @timed('extract_name')
+    def get_name_entity(self, lines: List[OcrLine], no_card_index: int) -> tuple:
         try:
-            name = self.change_wrong_character_name(data[no_card_index + 1])
-            result = " ".join(re.findall(r"[A-Z,.]{1,}[^a-z].*", name))
-            percentage = self.get_percentage_contain_text("[A-Z,.]+", name)
-            if result and percentage > 60:
-                return (" ".join(re.findall("[A-Z,.]+", result)), no_card_index + 1)
+            line = lines[no_card_index + 1]
+            if (result := clean_upper_punct_text(line.name_text)) and line.name_ratio > 60:
+                return (result, no_card_index + 1)
         except Exception:
             pass
 
         return (None, None)
 
-    def get_address_entity(self, data: list, name_index: int, no_card_index: int, date_index: int) -> tuple:
+    @timed('extract_address')
+    def get_address_entity(self, lines: List[OcrLine], name_index: int, no_card_index: int, date_index: int) -> tuple:
         index_one = name_index or no_card_index
         if index_one and index_one == name_index: index_one = index_one + 1
         if index_one and index_one == no_card_index: index_one = index_one + 2
-        if found := [i for i,v in enumerate(data) if len(re.findall(r"([A-Z/.,]{2,})", v)) != 0 and 'Alamat' in v]:
+        if found := [line.index for line in lines if line.text_word_count != 0 and 'Alamat' in line.keywords]:
             index_one = found[0]
 
         result = None
 
         try:
-            if self.get_percentage_contain_text("[A-Z0-9/.,]+",data[index_one]) >= 75:
-                result = data[index_one]
+            if lines[index_one].alnum_ratio >= 75:
+                result = lines[index_one].text
         except Exception:
             pass
 
@@ -412,86 +755,53 @@ class ImageOcrKIS(BaseImageOcr):
             if (
                 result is not None and
                 index_one + 1 != date_index and
-                self.get_percentage_contain_text("[A-Z0-9/.,]+",data[index_one + 1]) >= 75
+                lines[index_one + 1].alnum_ratio >= 75
             ):
-                result = "{} {}".format(data[index_one], data[index_one + 1])
+                result = "{} {}".format(lines[index_one].text, lines[index_one + 1].text)
         except Exception:
             pass
 
         if result:
-            result = " ".join(re.findall(r"([A-Z0-9/.,]{2,}.*)", result))
-            return (" ".join(re.findall("[A-Z0-9/.,]+", result)), index_one)
+            return (clean_alnum_text(result), index_one)
 
         return (None, None)
 
-    def get_birth_date_entity(self, data: list) -> tuple:
-        if not data: return (None, None)
+    @timed('extract_birth_date')
+    def get_birth_date_entity(self, lines: List[OcrLine]) -> tuple:
+        if not lines: return (None, None)
 
-        months = [
-            ('01','januari'), ('02','februari'),
-            ('03','maret'), ('04','april'),
-            ('05','mei'), ('06','juni'),
-            ('07','juli'), ('08','agustus'),
-            ('09','september'), ('10','oktober'),
-            ('11','november'), ('12','desember')
-        ]
-
-        guest_date = list()
-        for month in months:
-            date = [
-                (word[0], min([self.levenshtein(month[-1], x.lower()) for x in word[-1]]))
-                for word in [(i,v.split()) for i,v in enumerate(data)]
-            ]
-            date.sort(key=lambda tup: tup[-1])
-            guest_date.append((date[0][1],date[0][0],month))
+        # closest month of every word, tie goes to the earlier month then the earlier line
+        guest_date = None
+        for index, line in enumerate(lines):
+            for word in line.words:
+                if found := self.month_index.lookup(word.lower()):
+                    key = (found[1], self.month_index.order[found[0]], index)
+                    if guest_date is None or key < guest_date[0]:
+                        guest_date = (key, found[0], word)
 
-        guest_date.sort(key=lambda tup: tup[0])
-        guest_date = guest_date[0]
+        if guest_date is None: return (None, None)
 
-        # get word and replace month to number
-        replace_word = [(self.levenshtein(guest_date[-1][-1], x.lower()), x) for x in data[guest_date[1]].split()]
-        replace_word.sort(key=lambda tup: tup[0])
-        data[guest_date[1]] = data[guest_date[1]].replace(replace_word[0][-1],guest_date[-1][0])
+        # replace month to number
+        (_, _, index), month, word = guest_date
+        lines[index] = OcrLine(lines[index].text.replace(word, self.months[month]), lines[index].index)
 
-        try:
-            tgl = re.findall(r"(\d{1,2} \d{1,2} \d{4})",data[guest_date[1]])[0]
-            tgl = re.sub('[^0-9]','', tgl)
-            if len(tgl) == 7: tgl = "0{}".format(tgl)
-
-            date = datetime.strptime(tgl[0:2] + '-' + tgl[2:4] + '-' + tgl[4:], '%d-%m-%Y')
-            if((date.year > 1910) and (date.year < 2100)):
-                return (date.strftime('%d-%m-%Y'), guest_date[1])
-        except Exception:
-            pass
+        if found := SPACED_DATE_PATTERN.findall(lines[index].text):
+            day, month, year = [int(x) for x in found[0]]
+            if is_valid_date(day, month, year):
+                return (format_date(day, month, year), index)
 
         return (None, None)
 
-    def extract_image_to_text(self, image: str, debug: Optional[bool] = None) -> dict:
-        path = os.path.join(self.base_dir,'kis',image)
-
-        # read img
-        img = cv2.imread(path)
-
-        # convert the image to grayscale and blur sligthly
-        blur = cv2.medianBlur(img, 3)
-        gray = cv2.cvtColor(blur, cv2.COLOR_BGR2GRAY)
-
-        # threshold image
-        _, threshed = cv2.threshold(gray, 127, 255, cv2.THRESH_TRUNC)
-
-        # (3) Detect
-        result = pytesseract.image_to_string((threshed), lang="ind")
-        result = [x for x in [i.strip() for i in result.split('\n')] if len(x) > 2]
-
-        no_card, no_card_index = self.get_no_card_entity(result)
-        nik, nik_index = self.get_nik_entity(result, no_card)
-        date, date_index = self.get_birth_date_entity(result)
-        name, name_index = self.get_name_entity(result, no_card_index)
-        address, address_index = self.get_address_entity(result, name_index, no_card_index, date_index)
+    def extract_lines_to_text(self, lines: List[OcrLine], debug: Optional[bool] = None) -> Tuple[dict, dict]:
+        no_card, no_card_index = self.get_no_card_entity(lines)
+        nik, nik_index = self.get_nik_entity(lines, no_card)
+        date, date_index = self.get_birth_date_entity(lines)
+        name, name_index = self.get_name_entity(lines, no_card_index)
+        address, address_index = self.get_address_entity(lines, name_index, no_card_index, date_index)
 
         if debug:
             print("=" * 20)
-            print(result)
+            print([line.text for line in lines])
             print("=" * 20)
 
             print("NOMOR KARTU -> ",(no_card,no_card_index))
@@ -500,10 +810,131 @@ class ImageOcrKIS(BaseImageOcr):
             print("TGL LAHIR -> ",(date,date_index))
             print("ADDRESS -> ",(address, address_index))
 
-        return {
+        result = {
             'no_card': no_card if no_card and len(no_card) > 1 else None,
             'nik': nik if nik and len(nik) > 1 else None,
             'name': name if name and len(name) > 1 else None,
             'birth_date': date if date and len(date) > 1 else None,
             'address': address if address and len(address) > 1 else None
         }
+        indexes = {
+            'no_card': no_card_index, 'nik': nik_index, 'name': name_index,
+            'birth_date': date_index, 'address': address_index
+        }
+
+        return result, indexes
+
+    def extract_image_to_text(
+        self,
+        image: Union[bytes, np.ndarray],
+        debug: Optional[bool] = None,
+        check_quality: bool = True,
+        profile: Optional[str] = None
+    ) -> dict:
+        self.use_profile(profile)
+        # read img
+        img = self.load_card(image, check_quality)
+
+        return self.extract_with_ladder(img, debug)
+
+class ImageOcrPassport(BaseImageOcr):
+    # only the two lines of the machine readable zone are read
+    mrz_config: dict = {'psm': 6, 'whitelist': MRZ_WHITELIST}
+    genders: Dict[str, str] = {'M': 'LAKI-LAKI', 'F': 'PEREMPUAN'}
+
+    @timed('locate_mrz')
+    def locate_mrz(self, img: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Find the machine readable zone, a wide block of two dark text lines
+        :param img: Normalized passport page
+        :return: Grayscale crop of the mrz or None when not found
+        """
+        height, width = img.shape[:2]
+        ratio = max(width / 600, 1)
+        small = cv2.resize(img, (int(width / ratio), int(height / ratio)), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (3, 3), 0)
+
+        # blackhat keep the dark character on the light page, the horizontal gradient keep the text
+        blackhat = cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, cv2.getStructuringElement(cv2.MORPH_RECT, (13, 5)))
+        gradient = np.absolute(cv2.Sobel(blackhat, cv2.CV_32F, 1, 0, ksize=-1))
+        gradient = cv2.normalize(gradient, None, 0, 255, cv2.NORM_MINMAX).astype("uint8")
+
+        # join the character of a line, then the two lines together
+        gradient = cv2.morphologyEx(gradient, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (13, 5)))
+        _, threshed = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        threshed = cv2.morphologyEx(threshed, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (21, 21)))
+        threshed = cv2.erode(threshed, None, iterations=2)
+
+        contours = cv2.findContours(threshed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True):
+            x, y, w, h = cv2.boundingRect(contour)
+            if w / max(h, 1) > 5 and w / small.shape[1] > 0.4:
+                # grow the box a little, erode shrink it under the character
+                pad_x, pad_y = int(w * 0.03), int(h * 0.2)
+                x1, y1 = int(max(x - pad_x, 0) * ratio), int(max(y - pad_y, 0) * ratio)
+                x2, y2 = int(min(x + w + pad_x, small.shape[1]) * ratio), int(min(y + h + pad_y, small.shape[0]) * ratio)
+                return cv2.cvtColor(img[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+
+        return None
+
+    def extract_mrz(self, img: np.ndarray, debug: Optional[bool] = None) -> Optional[dict]:
+        region = self.locate_mrz(img)
+        if region is None:
+            # mrz is always at the bottom of the page
+            region = cv2.cvtColor(self.crop_band(img, (0, 0.7, 1, 1)), cv2.COLOR_BGR2GRAY)
+
+        with self.timer.stage('preprocess'):
+            _, threshed = cv2.threshold(region, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        with self.timer.stage('tesseract'):
+            text = self.engine.image_to_string(threshed, **{**self.tesseract_options(), **self.mrz_config})
+
+        # line of the mrz is long, the rest is noise of the page around the zone
+        lines = [line for line in text.split('\n') if len(line.strip()) > TD3_LENGTH * 0.7]
+
+        if debug:
+            print("=" * 20)
+            print(lines)
+            print("=" * 20)
+
+        for index in range(len(lines) - 1):
+            if normalize_line(lines[index]).startswith('P') and (mrz := parse_td3(lines[index], lines[index + 1])):
+                return mrz
+
+        return None
+
+    def extract_nik_to_text(
+        self,
+        image: Union[bytes, np.ndarray],
+        debug: Optional[bool] = None,
+        profile: Optional[str] = None
+    ) -> Optional[str]:
+        # passport number is already validated by its check digit
+        result = self.extract_image_to_text(image, debug, profile=profile)
+        return result['nik']
+
+    def extract_image_to_text(
+        self,
+        image: Union[bytes, np.ndarray],
+        debug: Optional[bool] = None,
+        check_quality: bool = True,
+        profile: Optional[str] = None
+    ) -> dict:
+        self.use_profile(profile)
+        # read img
+        img = self.load_card(image, check_quality)
+
+        if (mrz := self.extract_mrz(img, debug)) is None:
+            mrz = {'number_valid': False, 'birth_date_valid': False, 'name': None, 'sex': None}
+
+        if debug:
+            print("MRZ -> ", mrz)
+
+        return {
+            'nik': mrz['number'] if mrz['number_valid'] else None,
+            'name': mrz['name'],
+            'birth_date': mrz['birth_date'] if mrz['birth_date_valid'] else None,
+            'birth_place': None,
+            'gender': self.genders.get(mrz['sex']),
+            'address': None,
+            'ocr_step': 'mrz'
+        }
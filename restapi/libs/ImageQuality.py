@@ -0,0 +1,39 @@
+from redis import Redis
+
+class ImageQualityError(Exception):
+    """
+    Raised by the quality gate before ocr, picklable so it cross the worker process
+    """
+    messages = {
+        'too_small': "The card in the image is too small, please retake the photo closer to the card.",
+        'blurry': "The image is too blurry, please retake the photo.",
+        'glare': "The card has too much glare, please retake the photo without direct light."
+    }
+
+    def __init__(self, reason: str, message: str = None):
+        super().__init__(reason, message or self.messages[reason])
+        self.reason = reason
+        self.message = message or self.messages[reason]
+
+    @property
+    def detail(self) -> dict:
+        return {'reason': self.reason, 'message': self.message}
+
+class ImageQualityStats:
+    prefix: str = 'ocr_quality'
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    def incr(self, kind: str, outcome: str) -> None:
+        self.redis.hincrby(f"{self.prefix}:stats", f"{kind}:{outcome}", 1)
+
+    def stats(self) -> dict:
+        result = dict()
+        for field, value in self.redis.hgetall(f"{self.prefix}:stats").items():
+            kind, outcome = field.split(':')
+            if kind not in result:
+                result[kind] = {'passed': 0, 'too_small': 0, 'blurry': 0, 'glare': 0}
+            result[kind][outcome] = int(value)
+
+        return result
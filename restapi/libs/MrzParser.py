@@ -0,0 +1,105 @@
+from datetime import datetime
+from libs.DateParser import is_valid_date, format_date
+from typing import Optional
+
+MRZ_WHITELIST = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<"
+# passport (td3) has two lines of 44 characters
+TD3_LENGTH = 44
+CHECK_WEIGHTS = (7, 3, 1)
+
+# common ocr mistake on a field that only contain digit
+MRZ_DIGIT_TABLE = str.maketrans({
+    'O': '0', 'Q': '0', 'D': '0', 'U': '0',
+    'I': '1', 'L': '1', 'Z': '2', 'S': '5',
+    'G': '6', 'T': '7', 'B': '8'
+})
+# filler "<" is often read as one of these
+MRZ_FILLER_TABLE = str.maketrans({'«': '<<', '‹': '<', '(': '<', '{': '<', '[': '<'})
+
+def char_value(char: str) -> int:
+    if char.isdigit(): return int(char)
+    if 'A' <= char <= 'Z': return ord(char) - 55
+    return 0
+
+def compute_check_digit(data: str) -> int:
+    return sum(char_value(char) * CHECK_WEIGHTS[i % 3] for i, char in enumerate(data)) % 10
+
+def is_valid_check_digit(data: str, check: str) -> bool:
+    # empty optional field is filled with "<" and the check digit can be "<" too
+    if check == '<': check = '0'
+    return check.isdigit() and compute_check_digit(data) == int(check)
+
+def normalize_line(text: str) -> str:
+    """
+    Clean an ocr line of the mrz to exactly TD3_LENGTH characters
+    :param text: Raw ocr line
+    :return: Line with only mrz characters, padded or cut to TD3_LENGTH
+    """
+    text = "".join(x for x in text.upper().translate(MRZ_FILLER_TABLE) if x in MRZ_WHITELIST)
+    return text[:TD3_LENGTH].ljust(TD3_LENGTH, '<')
+
+def parse_mrz_date(yymmdd: str, past: bool = True) -> Optional[str]:
+    """
+    Date of the mrz, the century is not written
+    :param yymmdd: Six digits date
+    :param past: Birth date is always in the past, expiry date is around now
+    :return: Date with format dd-mm-yyyy
+    """
+    if not yymmdd.isdigit():
+        return None
+
+    yy, month, day = int(yymmdd[:2]), int(yymmdd[2:4]), int(yymmdd[4:6])
+    now = datetime.now().year
+    year = 2000 + yy
+    if past and year > now: year -= 100
+    if not past and year > now + 50: year -= 100
+
+    return format_date(day, month, year) if is_valid_date(day, month, year) else None
+
+def parse_name(field: str) -> Optional[str]:
+    # SURNAME<<GIVEN<NAMES written as GIVEN NAMES SURNAME
+    surname, _, given_names = field.partition('<<')
+    name = " ".join(given_names.replace('<', ' ').split() + surname.replace('<', ' ').split())
+    return name or None
+
+def parse_td3(line_one: str, line_two: str) -> Optional[dict]:
+    """
+    Parse and validate the two lines of a passport mrz with the icao check digits,
+    digit field is fixed from common ocr mistake before validated
+    :param line_one: First line, document type, issuing state and name
+    :param line_two: Second line, number, nationality, birth date, sex and expiry
+    :return: Every field of the mrz and whether its check digit is valid
+    """
+    line_one, line_two = normalize_line(line_one), normalize_line(line_two)
+    if line_one[0] != 'P':
+        return None
+
+    number, number_check = line_two[0:9], line_two[9].translate(MRZ_DIGIT_TABLE)
+    # document number is alphanumeric, only fall back to the digit fix when the check fail
+    if not is_valid_check_digit(number, number_check):
+        if is_valid_check_digit(fixed := number.translate(MRZ_DIGIT_TABLE), number_check):
+            number = fixed
+
+    birth_date, birth_check = line_two[13:19].translate(MRZ_DIGIT_TABLE), line_two[19].translate(MRZ_DIGIT_TABLE)
+    expiry_date, expiry_check = line_two[21:27].translate(MRZ_DIGIT_TABLE), line_two[27].translate(MRZ_DIGIT_TABLE)
+    personal_number, personal_check = line_two[28:42], line_two[42].translate(MRZ_DIGIT_TABLE)
+    composite_check = line_two[43].translate(MRZ_DIGIT_TABLE)
+
+    composite = number + number_check + birth_date + birth_check + expiry_date + expiry_check + \
+        personal_number + personal_check
+
+    return {
+        'document_type': line_one[0:2].replace('<', ''),
+        'issuing_state': line_one[2:5].replace('<', ''),
+        'name': parse_name(line_one[5:]),
+        'number': number.replace('<', ''),
+        'number_valid': is_valid_check_digit(number, number_check),
+        'nationality': line_two[10:13].replace('<', ''),
+        'birth_date': parse_mrz_date(birth_date),
+        'birth_date_valid': is_valid_check_digit(birth_date, birth_check),
+        'sex': line_two[20] if line_two[20] in 'MF' else None,
+        'expiry_date': parse_mrz_date(expiry_date, past=False),
+        'expiry_date_valid': is_valid_check_digit(expiry_date, expiry_check),
+        'personal_number_valid': is_valid_check_digit(personal_number, personal_check),
+        'composite_valid': is_valid_check_digit(composite, composite_check)
+    }
@@ -0,0 +1,116 @@
+import io, json, time, base64, hashlib, dhash
+import numpy as np
+from PIL import Image
+from redis import Redis
+from typing import NamedTuple, Optional
+
+class ImageHash(NamedTuple):
+    # exact content, the only key a result is returned for without max_distance
+    sha256: str
+    # perceptual hash, find the near candidates
+    dhash: Optional[str] = None
+    # grayscale thumbnail, verify a near candidate is the same photo
+    thumbnail: Optional[str] = None
+
+class OcrResultCache:
+    """
+    Cache ocr result by the sha256 of the image and the card kind, so a re-upload
+    of the same photo skip the ocr. With max_distance a recompression of it is found
+    by perceptual hash (dhash) too, but two cards of the same layout are often within
+    a few bits, so a near candidate is only returned when its thumbnail match.
+    """
+    prefix: str = 'ocr_cache'
+    thumbnail_size: tuple = (64, 40)
+
+    def __init__(self, redis: Redis, ttl: int, max_size: int, max_distance: int, max_thumbnail_diff: float):
+        self.redis = redis
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.max_thumbnail_diff = max_thumbnail_diff
+
+    def image_hash(self, image: bytes) -> ImageHash:
+        sha256 = hashlib.sha256(image).hexdigest()
+        if self.max_distance < 1:
+            return ImageHash(sha256)
+
+        with Image.open(io.BytesIO(image)) as img:
+            # jpeg can be decoded at reduced scale, dhash only need 9x8 pixels
+            img.draft('L', (256, 256))
+            img = img.convert('L')
+            thumbnail = img.resize(self.thumbnail_size, Image.BILINEAR).tobytes()
+            return ImageHash(sha256, dhash.format_hex(*dhash.dhash_row_col(img, size=8)), base64.b64encode(thumbnail).decode())
+
+    def hamming_distance(self, hash_one: str, hash_two: str) -> int:
+        return bin(int(hash_one, 16) ^ int(hash_two, 16)).count('1')
+
+    def thumbnail_diff(self, thumbnail_one: str, thumbnail_two: str) -> float:
+        # mean absolute difference of the gray levels, a recompression stay well under one
+        one, two = [np.frombuffer(base64.b64decode(x), dtype=np.uint8).astype(np.int16) for x in [thumbnail_one, thumbnail_two]]
+        return float(np.abs(one - two).mean())
+
+    def get_nearest_hash(self, kind: str, image_hash: ImageHash) -> Optional[str]:
+        if self.redis.exists(f"{self.prefix}:{kind}:{image_hash.sha256}"):
+            return image_hash.sha256
+
+        if self.max_distance < 1:
+            return None
+
+        # index is bounded by max_size, so scanning it is cheap
+        candidates = list()
+        for member in self.redis.zrange(f"{self.prefix}:{kind}:index", 0, -1):
+            sha256, _, candidate_dhash = member.partition(':')
+            if candidate_dhash and (distance := self.hamming_distance(image_hash.dhash, candidate_dhash)) <= self.max_distance:
+                candidates.append((distance, sha256))
+
+        # a dhash alone cannot tell apart two people on the same card layout
+        for _, sha256 in sorted(candidates):
+            thumbnail = self.redis.hget(f"{self.prefix}:{kind}:thumbnail", sha256)
+            if thumbnail and self.thumbnail_diff(image_hash.thumbnail, thumbnail) <= self.max_thumbnail_diff:
+                return sha256
+
+        return None
+
+    def get(self, kind: str, image_hash: ImageHash) -> Optional[dict]:
+        result = None
+        if nearest_hash := self.get_nearest_hash(kind, image_hash):
+            result = self.redis.get(f"{self.prefix}:{kind}:{nearest_hash}")
+
+        self.redis.hincrby(f"{self.prefix}:stats", f"{kind}:{'hits' if result else 'misses'}", 1)
+
+        return json.loads(result) if result else None
+
+    def set(self, kind: str, image_hash: ImageHash, result: dict) -> None:
+        index = f"{self.prefix}:{kind}:index"
+        thumbnails = f"{self.prefix}:{kind}:thumbnail"
+        member = f"{image_hash.sha256}:{image_hash.dhash}" if image_hash.dhash else image_hash.sha256
+        now = time.time()
+
+        pipe = self.redis.pipeline()
+        pipe.set(f"{self.prefix}:{kind}:{image_hash.sha256}", json.dumps(result), ex=self.ttl)
+        pipe.zadd(index, {member: now})
+        if image_hash.thumbnail:
+            pipe.hset(thumbnails, image_hash.sha256, image_hash.thumbnail)
+        pipe.execute()
+
+        # drop index member that already expired and keep the cache bounded, evict the oldest entries
+        evicted = self.redis.zrangebyscore(index, '-inf', now - self.ttl)
+        if (overflow := self.redis.zcard(index) - len(evicted) - self.max_size) > 0:
+            evicted += self.redis.zrange(index, len(evicted), len(evicted) + overflow - 1)
+        if evicted:
+            sha256 = [x.partition(':')[0] for x in evicted]
+            pipe = self.redis.pipeline()
+            pipe.zrem(index, *evicted)
+            pipe.hdel(thumbnails, *sha256)
+            pipe.delete(*[f"{self.prefix}:{kind}:{x}" for x in sha256])
+            pipe.execute()
+
+    def stats(self) -> dict:
+        result = dict()
+        for field, value in self.redis.hgetall(f"{self.prefix}:stats").items():
+            kind, counter = field.split(':')
+            if kind not in result:
+                result[kind] = {'hits': 0, 'misses': 0, 'size': self.redis.zcard(f"{self.prefix}:{kind}:index")}
+            result[kind][counter] = int(value)
+
+        return result
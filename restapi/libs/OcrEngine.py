@@ -0,0 +1,174 @@
+import os, logging, threading, functools, pytesseract
+import numpy as np
+from PIL import Image
+from typing import List, Optional, Tuple
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+logger = logging.getLogger("uvicorn.info")
+
+@functools.lru_cache(maxsize=None)
+def resolve_tessdata_dir(tessdata_dir: Optional[str]) -> Optional[str]:
+    # profile with traineddata that isn't installed fallback to the default one, warned once
+    if tessdata_dir and not os.path.isdir(tessdata_dir):
+        logger.warning(f"tessdata dir {tessdata_dir} not found, fallback to the default traineddata")
+        return None
+    return tessdata_dir
+
+class BaseOcrEngine:
+    def image_to_string(
+        self,
+        image: np.ndarray,
+        lang: str = 'ind',
+        psm: Optional[int] = None,
+        oem: Optional[int] = None,
+        whitelist: Optional[str] = None,
+        tessdata_dir: Optional[str] = None
+    ) -> str:
+        raise NotImplementedError
+
+    def image_to_data(
+        self,
+        image: np.ndarray,
+        lang: str = 'ind',
+        psm: Optional[int] = None,
+        oem: Optional[int] = None,
+        whitelist: Optional[str] = None,
+        tessdata_dir: Optional[str] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Recognize the image and keep the confidence of every word
+        :return: Lines of the image, every line is a list of (word, confidence 0-100)
+        """
+        raise NotImplementedError
+
+class PytesseractEngine(BaseOcrEngine):
+    """
+    Fork a tesseract binary for every call, slow but doesn't need libtesseract
+    """
+    def build_config(self, psm: Optional[int], oem: Optional[int], whitelist: Optional[str], tessdata_dir: Optional[str]) -> str:
+        config = list()
+        if tessdata_dir := resolve_tessdata_dir(tessdata_dir): config.append(f'--tessdata-dir "{tessdata_dir}"')
+        if psm is not None: config.append(f"--psm {psm}")
+        if oem is not None: config.append(f"--oem {oem}")
+        if whitelist: config.append(f"-c tessedit_char_whitelist={whitelist}")
+        return " ".join(config)
+
+    def image_to_string(
+        self,
+        image: np.ndarray,
+        lang: str = 'ind',
+        psm: Optional[int] = None,
+        oem: Optional[int] = None,
+        whitelist: Optional[str] = None,
+        tessdata_dir: Optional[str] = None
+    ) -> str:
+        return pytesseract.image_to_string(image, lang=lang, config=self.build_config(psm, oem, whitelist, tessdata_dir))
+
+    def image_to_data(
+        self,
+        image: np.ndarray,
+        lang: str = 'ind',
+        psm: Optional[int] = None,
+        oem: Optional[int] = None,
+        whitelist: Optional[str] = None,
+        tessdata_dir: Optional[str] = None
+    ) -> List[List[Tuple[str, float]]]:
+        data = pytesseract.image_to_data(
+            image, lang=lang, config=self.build_config(psm, oem, whitelist, tessdata_dir), output_type=pytesseract.Output.DICT
+        )
+
+        lines = dict()
+        for i, text in enumerate(data['text']):
+            # level 5 is a word, the other level are block, paragraph and line boxes
+            if data['level'][i] == 5 and text.strip():
+                key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+                lines.setdefault(key, list()).append((text.strip(), float(data['conf'][i])))
+
+        return list(lines.values())
+
+class TesserocrEngine(BaseOcrEngine):
+    """
+    Keep a warm TessBaseAPI handle per (thread, lang, oem, tessdata dir), traineddata is loaded once
+    """
+    def __init__(self, lang: str = 'ind'):
+        self.local = threading.local()
+        # load traineddata now instead of on the first request
+        self.get_api(lang, None, None)
+
+    def get_api(self, lang: str, oem: Optional[int], tessdata_dir: Optional[str]) -> 'tesserocr.PyTessBaseAPI':
+        if not hasattr(self.local, 'apis'):
+            self.local.apis = dict()
+
+        tessdata_dir = resolve_tessdata_dir(tessdata_dir)
+        if (lang, oem, tessdata_dir) not in self.local.apis:
+            kwargs = {'lang': lang}
+            if oem is not None: kwargs['oem'] = oem
+            if tessdata_dir: kwargs['path'] = tessdata_dir
+            self.local.apis[(lang, oem, tessdata_dir)] = tesserocr.PyTessBaseAPI(**kwargs)
+
+        return self.local.apis[(lang, oem, tessdata_dir)]
+
+    def image_to_string(
+        self,
+        image: np.ndarray,
+        lang: str = 'ind',
+        psm: Optional[int] = None,
+        oem: Optional[int] = None,
+        whitelist: Optional[str] = None,
+        tessdata_dir: Optional[str] = None
+    ) -> str:
+        api = self.get_api(lang, oem, tessdata_dir)
+        api.SetPageSegMode(psm if psm is not None else tesserocr.PSM.AUTO)
+        api.SetVariable('tessedit_char_whitelist', whitelist or '')
+        api.SetImage(Image.fromarray(image))
+        try:
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def image_to_data(
+        self,
+        image: np.ndarray,
+        lang: str = 'ind',
+        psm: Optional[int] = None,
+        oem: Optional[int] = None,
+        whitelist: Optional[str] = None,
+        tessdata_dir: Optional[str] = None
+    ) -> List[List[Tuple[str, float]]]:
+        api = self.get_api(lang, oem, tessdata_dir)
+        api.SetPageSegMode(psm if psm is not None else tesserocr.PSM.AUTO)
+        api.SetVariable('tessedit_char_whitelist', whitelist or '')
+        api.SetImage(Image.fromarray(image))
+        try:
+            api.Recognize()
+            lines, level = list(), tesserocr.RIL.WORD
+            if (iterator := api.GetIterator()) is None:
+                return lines
+
+            for word in tesserocr.iterate_level(iterator, level):
+                if (text := word.GetUTF8Text(level)) is None or not text.strip():
+                    continue
+                if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE) or not lines:
+                    lines.append(list())
+                lines[-1].append((text.strip(), word.Confidence(level)))
+
+            return lines
+        finally:
+            api.Clear()
+
+def get_ocr_engine(name: str) -> BaseOcrEngine:
+    if name == 'tesserocr':
+        if tesserocr is None:
+            logger.warning("tesserocr is not installed, fallback to pytesseract engine")
+            return PytesseractEngine()
+        try:
+            return TesserocrEngine()
+        except RuntimeError as err:
+            logger.warning(f"cannot initialize tesserocr ({err}), fallback to pytesseract engine")
+            return PytesseractEngine()
+
+    return PytesseractEngine()
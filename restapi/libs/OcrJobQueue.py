@@ -0,0 +1,192 @@
+import json, time
+from uuid import uuid4
+from redis import Redis
+from typing import Optional, Tuple
+
+class OcrJobQueue:
+    """
+    Ocr job queue on redis, the api only enqueue the image and separate worker
+    process consume it, so ocr capacity scale without the api process.
+    Job move from the queue to the processing list and get its fetch time atomically,
+    a job of a worker that died is put back to the queue once it passed the visibility timeout.
+    """
+    prefix: str = 'ocr_job'
+    # a script cannot block, an empty queue is polled at this interval
+    fetch_interval: float = 0.1
+
+    # move and mark as processing in one step, a worker that die right after the move
+    # still leave a started_at behind for requeue_stale
+    fetch_script: str = """
+    local job_id = redis.call('RPOPLPUSH', KEYS[1], KEYS[2])
+    if not job_id then return false end
+
+    local job_key = ARGV[1] .. ':' .. job_id
+    if redis.call('EXISTS', job_key) == 0 then
+        -- job expired while it was waiting in the queue
+        redis.call('LREM', KEYS[2], 1, job_id)
+        return {job_id}
+    end
+
+    redis.call('HSET', job_key, 'status', 'processing', 'started_at', ARGV[2])
+    local job = redis.call('HMGET', job_key, 'kind', 'image', 'kwargs')
+    return {job_id, job[1], job[2], job[3]}
+    """
+
+    def __init__(self, redis: Redis, ttl: int, max_retries: int, visibility_timeout: int):
+        # the image is raw bytes, the connection must not decode responses
+        self.redis = redis
+        self.ttl = ttl
+        self.max_retries = max_retries
+        self.visibility_timeout = visibility_timeout
+
+        self.queue_key = f"{self.prefix}:queue"
+        self.processing_key = f"{self.prefix}:processing"
+        self.stats_key = f"{self.prefix}:stats"
+        self.fetch_job = self.redis.register_script(self.fetch_script)
+
+    def job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:{job_id}"
+
+    def submit(self, kind: str, image: bytes, **kwargs) -> str:
+        job_id = uuid4().hex
+
+        pipe = self.redis.pipeline()
+        pipe.hset(self.job_key(job_id), mapping={
+            'kind': kind,
+            'image': image,
+            'kwargs': json.dumps(kwargs),
+            'status': 'queued',
+            'retries': 0,
+            'created_at': time.time()
+        })
+        pipe.expire(self.job_key(job_id), self.ttl)
+        pipe.lpush(self.queue_key, job_id)
+        pipe.execute()
+
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        State of the job without the image
+        :param job_id: Id returned by submit
+        :return: Status, result or error, retry count and latency in ms or None when the job not found
+        """
+        fields = ['kind', 'status', 'result', 'error', 'retries', 'created_at', 'started_at', 'finished_at']
+        values = dict(zip(fields, self.redis.hmget(self.job_key(job_id), fields)))
+        if values['status'] is None:
+            return None
+
+        values = {k: v.decode() if isinstance(v, bytes) else v for k, v in values.items()}
+        created_at, started_at, finished_at = [
+            float(values[x]) if values[x] else None for x in ['created_at', 'started_at', 'finished_at']
+        ]
+
+        return {
+            'job_id': job_id,
+            'kind': values['kind'],
+            'status': values['status'],
+            'result': json.loads(values['result']) if values['result'] else None,
+            'error': json.loads(values['error']) if values['error'] else None,
+            'retries': int(values['retries']),
+            'wait_time': round((started_at - created_at) * 1000, 2) if started_at else None,
+            'process_time': round((finished_at - started_at) * 1000, 2) if finished_at and started_at else None
+        }
+
+    def fetch(self, timeout: int) -> Optional[Tuple[str, str, bytes, dict]]:
+        """
+        Wait until a job available and mark it as processing
+        :param timeout: Second to wait for a job
+        :return: (job_id, kind, image, kwargs) or None when no job
+        """
+        deadline = time.time() + timeout
+        while True:
+            if job := self.fetch_job(keys=[self.queue_key, self.processing_key], args=[self.prefix, time.time()]):
+                if len(job) == 4:
+                    job_id, kind, image, kwargs = job
+                    return job_id.decode(), kind.decode(), image, json.loads(kwargs)
+                # expired job skipped, the next one may be ready
+                continue
+            if time.time() >= deadline:
+                return None
+            time.sleep(self.fetch_interval)
+
+    def finish(self, job_id: str, status: str, **fields) -> None:
+        started_at, created_at = self.redis.hmget(self.job_key(job_id), ['started_at', 'created_at'])
+        finished_at = time.time()
+
+        pipe = self.redis.pipeline()
+        pipe.hset(self.job_key(job_id), mapping={'status': status, 'finished_at': finished_at, **fields})
+        # the image is not needed anymore, keep only the result until ttl
+        pipe.hdel(self.job_key(job_id), 'image')
+        pipe.lrem(self.processing_key, 1, job_id)
+        pipe.hincrby(self.stats_key, status, 1)
+        if started_at and created_at:
+            pipe.hincrbyfloat(self.stats_key, 'wait_time', (float(started_at) - float(created_at)) * 1000)
+            pipe.hincrbyfloat(self.stats_key, 'process_time', (finished_at - float(started_at)) * 1000)
+        pipe.execute()
+
+    def complete(self, job_id: str, result: dict) -> None:
+        self.finish(job_id, 'done', result=json.dumps(result))
+
+    def fail(self, job_id: str, error, retry: bool = True) -> None:
+        """
+        Put the job back to the queue until max_retries, after that the job failed
+        :param error: Detail of the error returned to the client
+        :param retry: False when the error will happen again, e.g the image quality
+        """
+        if retry and int(self.redis.hget(self.job_key(job_id), 'retries') or 0) < self.max_retries:
+            pipe = self.redis.pipeline()
+            pipe.hincrby(self.job_key(job_id), 'retries', 1)
+            pipe.hset(self.job_key(job_id), 'status', 'queued')
+            pipe.hdel(self.job_key(job_id), 'started_at')
+            pipe.lrem(self.processing_key, 1, job_id)
+            pipe.lpush(self.queue_key, job_id)
+            pipe.hincrby(self.stats_key, 'retried', 1)
+            pipe.execute()
+            return
+
+        self.finish(job_id, 'failed', error=json.dumps(error))
+
+    def requeue_stale(self) -> int:
+        """
+        Retry the job of a worker that died while processing it
+        :return: Number of job put back to the queue
+        """
+        now, requeued = time.time(), 0
+        for job_id in self.redis.lrange(self.processing_key, 0, -1):
+            job_id = job_id.decode()
+            status, started_at, created_at = self.redis.hmget(self.job_key(job_id), ['status', 'started_at', 'created_at'])
+            if status is None:
+                # job expired, nothing to retry
+                self.redis.lrem(self.processing_key, 1, job_id)
+                continue
+            # fetch always set started_at, without it the job was moved by an older worker that died
+            if now - float(started_at or created_at) < self.visibility_timeout:
+                continue
+
+            # only the worker that removed it from the list requeue it
+            if self.redis.lrem(self.processing_key, 1, job_id):
+                self.fail(job_id, "The image took too long to process, please try again.")
+                requeued += 1
+
+        return requeued
+
+    def stats(self) -> dict:
+        pipe = self.redis.pipeline()
+        pipe.llen(self.queue_key)
+        pipe.llen(self.processing_key)
+        pipe.hgetall(self.stats_key)
+        queued, processing, stats = pipe.execute()
+
+        stats = {k.decode(): float(v) for k, v in stats.items()}
+        finished = stats.get('done', 0) + stats.get('failed', 0)
+
+        return {
+            'queued': queued,
+            'processing': processing,
+            'done': int(stats.get('done', 0)),
+            'failed': int(stats.get('failed', 0)),
+            'retried': int(stats.get('retried', 0)),
+            'avg_wait_time': round(stats.get('wait_time', 0) / finished, 2) if finished else 0.0,
+            'avg_process_time': round(stats.get('process_time', 0) / finished, 2) if finished else 0.0
+        }
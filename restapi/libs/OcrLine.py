@@ -0,0 +1,117 @@
+import re
+from functools import cached_property
+from typing import FrozenSet, List, Tuple
+
+# compiled once, every line of the card is scanned a single time
+DIGIT_PATTERN = re.compile(r"[^0-9]")
+NIK_START_PATTERN = re.compile(r"[0-9]{2,}.*")
+UPPER_WORD_PATTERN = re.compile(r"[A-Z]{2,}")
+UPPER_TOKEN_PATTERN = re.compile(r"\b[A-Z]{3,}\b")
+UPPER_START_PATTERN = re.compile(r"[A-Z]{1,}[^a-z].*")
+UPPER_RUN_PATTERN = re.compile(r"[A-Z]+")
+UPPER_PUNCT_START_PATTERN = re.compile(r"[A-Z,.]{1,}[^a-z].*")
+UPPER_PUNCT_RUN_PATTERN = re.compile(r"[A-Z,.]+")
+TEXT_RUN_PATTERN = re.compile(r"[A-Z/.,]+")
+TEXT_WORD_PATTERN = re.compile(r"[A-Z/.,]{2,}")
+SPACED_DATE_PATTERN = re.compile(r"(\d{1,2}) (\d{1,2}) (\d{4})")
+NUMBER_RUN_PATTERN = re.compile(r"[0-9]+")
+DATE_RUN_PATTERN = re.compile(r"[0-9/]+")
+ALNUM_START_PATTERN = re.compile(r"([A-Z0-9/.,]{2,}.*)")
+ALNUM_RUN_PATTERN = re.compile(r"[A-Z0-9/.,]+")
+KEYWORD_PATTERN = re.compile(r"\b(RT|RW|RTRW|KAWIN|BELUM|CERAI|HIDUP|MATI|PROVINSI|KOTA|KABUPATEN)\b")
+
+STATUS_KEYWORDS = frozenset(['RT','RW','RTRW','KAWIN','BELUM','CERAI','HIDUP','MATI'])
+REGION_KEYWORDS = frozenset(['PROVINSI','KOTA','KABUPATEN'])
+# label of the card, matched as written on the card
+LABEL_KEYWORDS = ['Gol','Darah','Alamat']
+# matched case insensitive
+LOWER_KEYWORDS = ['nik','nama','laki','perempuan','wanita']
+
+NIK_DIGIT_TABLE = str.maketrans({
+    'U': '0', 'O': '0', 'D': '0', 'N': '0',
+    'L': '1', ')': '1', 'C': '2',
+    'Y': '4', 'H': '4', 'S': '5', 'b': '6',
+    '?': '7', 'A': '8', 'I': '9'
+})
+DATE_DIGIT_TABLE = str.maketrans({'/': '7'})
+
+def get_percentage_contain_text(pattern: re.Pattern, text: str) -> float:
+    if not text: return 0.0
+    return (len(" ".join(pattern.findall(text))) / len(text)) * 100
+
+def clean_upper_text(text: str) -> str:
+    result = " ".join(UPPER_START_PATTERN.findall(text))
+    return " ".join(UPPER_RUN_PATTERN.findall(result))
+
+def clean_upper_punct_text(text: str) -> str:
+    result = " ".join(UPPER_PUNCT_START_PATTERN.findall(text))
+    return " ".join(UPPER_PUNCT_RUN_PATTERN.findall(result))
+
+def clean_alnum_text(text: str) -> str:
+    result = " ".join(ALNUM_START_PATTERN.findall(text))
+    return " ".join(ALNUM_RUN_PATTERN.findall(result))
+
+class OcrLine:
+    """
+    Features of one ocr line shared by every entity resolver, features read on
+    every line are computed up front and the rest once on first access
+    """
+    def __init__(self, text: str, index: int = 0):
+        self.index = index
+        self.text = text
+        # digits only of the raw text and of the text with ocr digit mistakes fixed
+        self.digits = "".join(NUMBER_RUN_PATTERN.findall(text))
+        self.date_digits = "".join(DATE_RUN_PATTERN.findall(text)).translate(DATE_DIGIT_TABLE)
+        self.nik_text = "".join(NIK_START_PATTERN.findall(text.replace("NIK","").translate(NIK_DIGIT_TABLE)))
+        self.nik_digit_count = sum(map(str.isdigit, self.nik_text))
+        self.upper_word_count = len(UPPER_WORD_PATTERN.findall(text))
+
+        lower = text.lower()
+        keywords = set(KEYWORD_PATTERN.findall(text))
+        keywords.update(x for x in LABEL_KEYWORDS if x in text)
+        keywords.update(x for x in LOWER_KEYWORDS if x in lower)
+        self.keywords: FrozenSet[str] = frozenset(keywords)
+
+    def __repr__(self) -> str:
+        return f"OcrLine({self.text!r}, {self.index})"
+
+    @cached_property
+    def words(self) -> Tuple[str, ...]:
+        return tuple(self.text.split())
+
+    @cached_property
+    def upper_tokens(self) -> Tuple[str, ...]:
+        return tuple(UPPER_TOKEN_PATTERN.findall(self.text))
+
+    @cached_property
+    def text_word_count(self) -> int:
+        return len(TEXT_WORD_PATTERN.findall(self.text))
+
+    # percentage of the text covered by the character class
+    @cached_property
+    def upper_ratio(self) -> float:
+        return get_percentage_contain_text(UPPER_RUN_PATTERN, self.text)
+
+    @cached_property
+    def text_ratio(self) -> float:
+        return get_percentage_contain_text(TEXT_RUN_PATTERN, self.text)
+
+    @cached_property
+    def number_ratio(self) -> float:
+        return get_percentage_contain_text(NUMBER_RUN_PATTERN, self.text)
+
+    @cached_property
+    def alnum_ratio(self) -> float:
+        return get_percentage_contain_text(ALNUM_RUN_PATTERN, self.text)
+
+    # "|" is the common mistake of "I" in a name
+    @cached_property
+    def name_text(self) -> str:
+        return self.text.replace("|","I")
+
+    @cached_property
+    def name_ratio(self) -> float:
+        return get_percentage_contain_text(UPPER_PUNCT_RUN_PATTERN, self.name_text)
+
+def tokenize_lines(data: List[str]) -> List[OcrLine]:
+    return [OcrLine(text, index) for index, text in enumerate(data)]
@@ -0,0 +1,112 @@
+import time, functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from redis import Redis
+from typing import Callable, Dict, Iterator, Optional
+
+# timing of the ocr jobs of the current request, set only when the client ask for Server-Timing
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_timings', default=None)
+
+def add_request_timings(timings: Dict[str, float]) -> None:
+    if (current := request_timings.get()) is not None:
+        for stage, seconds in timings.items():
+            current[stage] = current.get(stage, 0.0) + seconds
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={round(seconds * 1000, 2)}" for stage, seconds in timings.items())
+
+class StageTimer:
+    """
+    Wall time of every stage of one ocr job, a stage that run many times
+    (e.g every step of the preprocess ladder) is summed
+    """
+    def __init__(self):
+        self.timings: Dict[str, float] = dict()
+
+    def reset(self) -> None:
+        self.timings = dict()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+def timed(stage: str) -> Callable:
+    # method of a class with a StageTimer on self.timer
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.timer.stage(stage):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+class OcrMetrics:
+    """
+    Stage latency histograms and field outcome counters kept on redis,
+    so the api, its worker pool and every ocr_worker.py report to one place
+    """
+    prefix: str = 'ocr_metrics'
+    # upper bound of every histogram bucket in second
+    buckets: tuple = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    # key of the result that are not a field of the card
+    ignore_fields: tuple = ('ocr_step', 'kind')
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    def record(self, kind: str, timings: Dict[str, float], result: Optional[dict] = None) -> None:
+        """
+        :param kind: Card kind
+        :param timings: Second spent on every stage
+        :param result: Fields of the card, a field is a success when it's not None
+        """
+        pipe = self.redis.pipeline()
+        for stage, seconds in timings.items():
+            bucket = next((str(x) for x in self.buckets if seconds <= x), '+Inf')
+            pipe.hincrby(f"{self.prefix}:stage", f"{kind}:{stage}:{bucket}", 1)
+            pipe.hincrbyfloat(f"{self.prefix}:stage", f"{kind}:{stage}:sum", seconds)
+
+        for field, value in (result or {}).items():
+            if field not in self.ignore_fields:
+                outcome = 'success' if value is not None else 'failure'
+                pipe.hincrby(f"{self.prefix}:field", f"{kind}:{field}:{outcome}", 1)
+        pipe.execute()
+
+    def render(self) -> str:
+        """
+        Metrics in the prometheus text exposition format
+        """
+        stages, fields = dict(), dict()
+        for key, value in self.redis.hgetall(f"{self.prefix}:stage").items():
+            kind, stage, bucket = key.split(':')
+            stages.setdefault((kind, stage), dict())[bucket] = float(value)
+        for key, value in self.redis.hgetall(f"{self.prefix}:field").items():
+            kind, field, outcome = key.split(':')
+            fields[(kind, field, outcome)] = int(value)
+
+        lines = [
+            "# HELP ocr_stage_duration_seconds Time spent on every stage of the card ocr.",
+            "# TYPE ocr_stage_duration_seconds histogram"
+        ]
+        for (kind, stage), values in sorted(stages.items()):
+            labels = f'kind="{kind}",stage="{stage}"'
+            # bucket is stored per range, prometheus bucket is cumulative
+            total = 0
+            for bucket in [str(x) for x in self.buckets] + ['+Inf']:
+                total += int(values.get(bucket, 0))
+                lines.append(f'ocr_stage_duration_seconds_bucket{{{labels},le="{bucket}"}} {total}')
+            lines.append(f"ocr_stage_duration_seconds_sum{{{labels}}} {values.get('sum', 0.0)}")
+            lines.append(f"ocr_stage_duration_seconds_count{{{labels}}} {total}")
+
+        lines += [
+            "# HELP ocr_field_total Field of the card found or missing after ocr.",
+            "# TYPE ocr_field_total counter"
+        ]
+        for (kind, field, outcome), value in sorted(fields.items()):
+            lines.append(f'ocr_field_total{{kind="{kind}",field="{field}",outcome="{outcome}"}} {value}')
+
+        return "\n".join(lines) + "\n"
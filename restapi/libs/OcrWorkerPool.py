@@ -0,0 +1,169 @@
+import numpy as np
+import os, cv2, time, asyncio, functools, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException
+from config import settings
+from libs.ImageOcr import ImageOcrKTP, ImageOcrKIS, ImageOcrPassport
+from libs.OcrEngine import get_ocr_engine
+from libs.OcrCache import OcrResultCache
+from libs.ImageQuality import ImageQualityError, ImageQualityStats
+from libs.OcrMetrics import OcrMetrics, add_request_timings
+from typing import Any, Dict, Optional, Tuple, Union
+
+# image ocr instances owned by every worker process, filled by worker_initializer
+ocr_instances = dict()
+
+def worker_initializer(opencv_threads: int, engine_name: str) -> None:
+    # pin thread count so N workers don't oversubscribe the cores
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    cv2.setNumThreads(opencv_threads)
+
+    # one warm ocr engine per worker, shared by every card kind
+    engine = get_ocr_engine(engine_name)
+    ocr_instances.update({'ktp': ImageOcrKTP(engine), 'kis': ImageOcrKIS(engine), 'paspor': ImageOcrPassport(engine)})
+
+def run_job(kind: str, method: str, *args, **kwargs) -> Tuple[Any, Dict[str, float]]:
+    instance = ocr_instances[kind]
+    instance.timer.reset()
+
+    with instance.timer.stage('total'):
+        result = getattr(instance, method)(*args, **kwargs)
+
+    return result, instance.timer.timings
+
+class OcrWorkerPool:
+    def __init__(
+        self,
+        max_workers: int,
+        max_concurrency: int,
+        job_timeout: int,
+        max_jobs_per_worker: int,
+        opencv_threads: int,
+        engine_name: str
+    ):
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.opencv_threads = opencv_threads
+        self.engine_name = engine_name
+
+        self.executor = None
+        self.executor_jobs = 0
+        self.semaphore = None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn instead of fork, the api process already has running threads and an event loop
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=worker_initializer,
+            initargs=(self.opencv_threads, self.engine_name)
+        )
+
+    def _recycle_executor(self) -> None:
+        # ProcessPoolExecutor on python 3.8 doesn't have max_tasks_per_child,
+        # so replace the whole executor and let the old one finish in-flight jobs
+        old_executor = self.executor
+        self.executor = self._new_executor()
+        self.executor_jobs = 0
+        old_executor.shutdown(wait=False)
+
+    def start(self) -> None:
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.executor = self._new_executor()
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def _release(self, job: asyncio.Future) -> None:
+        # job that outlived its request, nobody await it anymore
+        if not job.cancelled(): job.exception()
+        self.semaphore.release()
+
+    async def submit(self, kind: str, method: str, *args, **kwargs) -> Any:
+        await self.semaphore.acquire()
+        try:
+            if self.executor_jobs >= self.max_jobs_per_worker * self.max_workers:
+                self._recycle_executor()
+            self.executor_jobs += 1
+
+            loop = asyncio.get_event_loop()
+            executor = self.executor
+            job = loop.run_in_executor(executor, functools.partial(run_job, kind, method, *args, **kwargs))
+        except BaseException:
+            self.semaphore.release()
+            raise
+        # the slot is held until the worker is actually free, not until the request give up
+        job.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(job), timeout=self.job_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504,detail="The image took too long to process, please try again.")
+        except BrokenProcessPool:
+            # every job of a broken executor fail together, only the first one replace it
+            if self.executor is executor:
+                self._recycle_executor()
+            raise HTTPException(status_code=503,detail="The image processor is restarting, please try again.")
+
+class OcrWorkerProxy:
+    def __init__(
+        self,
+        pool: OcrWorkerPool,
+        kind: str,
+        cache: Optional[OcrResultCache] = None,
+        quality_stats: Optional[ImageQualityStats] = None,
+        metrics: Optional[OcrMetrics] = None
+    ):
+        self.pool = pool
+        self.kind = kind
+        self.cache = cache
+        self.quality_stats = quality_stats
+        self.metrics = metrics
+
+    async def submit(self, image: Union[bytes, np.ndarray], method: str = 'extract_image_to_text', **kwargs) -> Any:
+        try:
+            result, timings = await self.pool.submit(self.kind, method, image, **kwargs)
+        except ImageQualityError as err:
+            if self.quality_stats: self.quality_stats.incr(self.kind, err.reason)
+            raise HTTPException(status_code=422,detail=err.detail)
+
+        # image that already passed the gate on an earlier job isn't counted twice
+        if self.quality_stats and kwargs.get('check_quality', True):
+            self.quality_stats.incr(self.kind, 'passed')
+        # field outcome only make sense for the whole card
+        if self.metrics:
+            self.metrics.record(self.kind, timings, result if method == 'extract_image_to_text' else None)
+        add_request_timings(timings)
+
+        return result
+
+    async def extract_nik_to_text(self, image: Union[bytes, np.ndarray], **kwargs) -> Optional[str]:
+        return await self.submit(image, 'extract_nik_to_text', **kwargs)
+
+    def cache_kind(self, profile: Optional[str]) -> str:
+        # result of another profile is another answer, the default profile keep the plain kind
+        if profile in [None, settings.ocr_default_profile]:
+            return self.kind
+        return f"{self.kind}_{profile}"
+
+    async def extract_image_to_text(self, image: Union[bytes, np.ndarray], **kwargs) -> dict:
+        if self.cache is None or not isinstance(image, bytes):
+            return await self.submit(image, **kwargs)
+
+        started_at = time.perf_counter()
+        loop = asyncio.get_event_loop()
+        image_hash = await loop.run_in_executor(None, self.cache.image_hash, image)
+        cache_kind = self.cache_kind(kwargs.get('profile'))
+        result = self.cache.get(cache_kind, image_hash)
+        add_request_timings({'cache': time.perf_counter() - started_at})
+
+        if result is None:
+            result = await self.submit(image, **kwargs)
+            self.cache.set(cache_kind, image_hash, result)
+
+        return result
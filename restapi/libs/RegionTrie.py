@@ -0,0 +1,130 @@
+import re
+from libs.AreaCode import AreaCodeIndex
+from typing import Dict, List, Optional, Tuple
+
+LEVELS = {2: 'province', 4: 'district', 6: 'subdistrict'}
+
+def normalize(text: str) -> str:
+    # KAB. BADUNG -> KAB BADUNG
+    return " ".join(re.sub(r'[^0-9A-Z]+', ' ', text.upper()).split())
+
+class TrieNode:
+    __slots__ = ['children', 'ranked']
+
+    def __init__(self):
+        self.children: Dict[str, 'TrieNode'] = dict()
+        # best regions of the whole subtree, precomputed so a prefix never walk the subtree
+        self.ranked: Tuple[int, ...] = tuple()
+
+class RegionTrie:
+    """
+    Prefix trie over the name of every province, kabupaten and kecamatan starting at
+    every word (KUTA SELATAN is found by KUTA and SELATAN) and over their codes.
+    Every node keep the top regions of its subtree, an exact prefix is one walk down
+    the trie, a fuzzy prefix walk the trie with a levenshtein row per node.
+    """
+    def __init__(self, index: AreaCodeIndex, max_results: int):
+        self.index = index
+        self.max_results = max_results
+        self.root = TrieNode()
+
+        regions, seen = list(), set()
+        for row, code in enumerate(index.data.rows['code'].tolist()):
+            for length in [2, 4, 6]:
+                if (prefix := f"{code:06d}"[:length]) not in seen:
+                    seen.add(prefix)
+                    regions.append(self.region(prefix, row))
+
+        # position is the rank, province first then kabupaten then kecamatan, shorter name is the closer match
+        self.regions: List[dict] = sorted(regions, key=lambda x: (len(x['code']), len(x['name']), x['name']))
+        self.codes: Dict[str, int] = {region['code']: region_id for region_id, region in enumerate(self.regions)}
+
+        for region_id, region in enumerate(self.regions):
+            name = normalize(region['name'])
+            starts = [0] + [match.end() for match in re.finditer(' ', name)]
+            for key in [name[start:] for start in starts] + [region['code']]:
+                self.insert(key, region_id)
+
+    def region(self, code: str, row: int) -> dict:
+        names = {'province': self.index.name(row, 'province')}
+        if len(code) >= 4: names['district'] = self.index.name(row, 'district')
+        if len(code) == 6: names['subdistrict'] = self.index.name(row, 'subdistrict')
+        return {'code': code, 'level': LEVELS[len(code)], 'name': names[LEVELS[len(code)]], **names}
+
+    def insert(self, key: str, region_id: int) -> None:
+        # regions are inserted best first, a full node is never better for a later region
+        node = self.root
+        for char in key:
+            node = node.children.setdefault(char, TrieNode())
+            if len(node.ranked) < self.max_results and region_id not in node.ranked:
+                node.ranked += (region_id,)
+
+    def search(self, query: str, limit: int, max_distance: int = 0) -> List[dict]:
+        """
+        :param query: Prefix of a name or a code, case and punctuation are ignored
+        :param limit: Maximum number of regions, at most max_results
+        :param max_distance: Typo allowed in the prefix when nothing start with the query,
+        one typo every four chars of the query up to max_distance, a code is never fuzzy
+        :return: Regions ranked by typo then level then length of the name
+        """
+        if not (query := normalize(query)):
+            return list()
+
+        # the regions of a node are already ranked
+        if node := self.walk(query):
+            return [self.regions[region_id] for region_id in node.ranked[:limit]]
+        if query.isdigit() or not (max_distance := min(max_distance, len(query) // 4)):
+            return list()
+
+        found = self.fuzzy(query, max_distance)
+        result = sorted(found, key=lambda region_id: (found[region_id], region_id))
+        return [self.regions[region_id] for region_id in result[:limit]]
+
+    def walk(self, prefix: str) -> Optional[TrieNode]:
+        node = self.root
+        for char in prefix:
+            if (node := node.children.get(char)) is None:
+                return None
+        return node
+
+    def fuzzy(self, query: str, max_distance: int) -> Dict[int, int]:
+        """
+        Walk the trie with one row of the levenshtein matrix per node, a branch stop
+        once every cell of its row is above max_distance. The first char is never a typo,
+        so only the branch of the first char is walked.
+        :return: Smallest distance of the query to a prefix of every region found
+        """
+        found: Dict[int, int] = dict()
+        if (first := self.root.children.get(query[0])) is None:
+            return found
+
+        # row of the first char already matched
+        first_row = [1] + list(range(len(query)))
+        stack = [(char, child, first_row) for char, child in first.children.items()]
+        while stack:
+            char, node, previous = stack.pop()
+            row = [previous[0] + 1]
+            for column in range(1, len(query) + 1):
+                row.append(min(
+                    row[column - 1] + 1,
+                    previous[column] + 1,
+                    previous[column - 1] + (query[column - 1] != char)
+                ))
+
+            if row[-1] <= max_distance:
+                for region_id in node.ranked:
+                    if row[-1] < found.get(region_id, max_distance + 1):
+                        found[region_id] = row[-1]
+            if min(row) <= max_distance:
+                stack.extend((next_char, child, row) for next_char, child in node.children.items())
+
+        return found
+
+    def children_of(self, code: str) -> Optional[List[dict]]:
+        """
+        :param code: Province or kabupaten code
+        :return: Kabupaten of a province or kecamatan of a kabupaten, None when not found
+        """
+        if not (children := self.index.children_of(code)):
+            return None
+        return [self.regions[self.codes[child]] for child in children]
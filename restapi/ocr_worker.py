@@ -0,0 +1,111 @@
+import logging, signal, time
+from config import settings, redis_conn, redis_binary_conn
+from libs.OcrWorkerPool import worker_initializer, run_job
+from libs.OcrJobQueue import OcrJobQueue
+from libs.OcrCache import OcrResultCache
+from libs.ImageQuality import ImageQualityError, ImageQualityStats
+from libs.OcrMetrics import OcrMetrics
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger("ocr_worker")
+
+class OcrJobWorker:
+    """
+    Consume the ocr job queue, run as many process of this as the ocr load need:
+    docker-compose up -d --scale ocr-worker=4
+    """
+    def __init__(
+        self,
+        queue: OcrJobQueue,
+        cache: Optional[OcrResultCache],
+        quality_stats: ImageQualityStats,
+        metrics: Optional[OcrMetrics] = None
+    ):
+        self.queue = queue
+        self.cache = cache
+        self.quality_stats = quality_stats
+        self.metrics = metrics
+        self.running = False
+
+    def extract_image_to_text(self, kind: str, image: bytes, **kwargs) -> dict:
+        # same cache and quality stats as the ocr of the api
+        image_hash = self.cache.image_hash(image) if self.cache else None
+        if image_hash and (result := self.cache.get(kind, image_hash)) is not None:
+            return result
+
+        try:
+            result, timings = run_job(kind, 'extract_image_to_text', image, **kwargs)
+        except ImageQualityError as err:
+            self.quality_stats.incr(kind, err.reason)
+            raise
+
+        self.quality_stats.incr(kind, 'passed')
+        if self.metrics:
+            self.metrics.record(kind, timings, result)
+        if image_hash:
+            self.cache.set(kind, image_hash, result)
+
+        return result
+
+    def process(self, job_id: str, kind: str, image: bytes, kwargs: dict) -> None:
+        try:
+            result = self.extract_image_to_text(kind, image, **kwargs)
+        except ImageQualityError as err:
+            # retry will get the same answer
+            self.queue.fail(job_id, err.detail, retry=False)
+        except ValueError as err:
+            self.queue.fail(job_id, str(err), retry=False)
+        except Exception:
+            logger.exception(f"job {job_id} failed")
+            self.queue.fail(job_id, "The image cannot be processed, please try again.")
+        else:
+            self.queue.complete(job_id, {**result, 'kind': kind})
+
+    def stop(self, *args) -> None:
+        # finish the current job before exit
+        self.running = False
+
+    def run(self) -> None:
+        self.running = True
+        last_requeue = 0.0
+
+        while self.running:
+            if time.time() - last_requeue > self.queue.visibility_timeout / 2:
+                if requeued := self.queue.requeue_stale():
+                    logger.info(f"requeue {requeued} stale jobs")
+                last_requeue = time.time()
+
+            if (job := self.queue.fetch(timeout=1)) is None:
+                continue
+
+            started_at = time.time()
+            self.process(*job)
+            logger.info(f"job {job[0]} {job[1]} finished in {round((time.time() - started_at) * 1000)}ms")
+
+if __name__ == '__main__':
+    # one warm ocr engine for this process
+    worker_initializer(settings.ocr_opencv_threads, settings.ocr_engine)
+
+    worker = OcrJobWorker(
+        queue=OcrJobQueue(
+            redis=redis_binary_conn,
+            ttl=settings.ocr_job_ttl,
+            max_retries=settings.ocr_job_max_retries,
+            visibility_timeout=settings.ocr_job_visibility_timeout
+        ),
+        cache=OcrResultCache(
+            redis=redis_conn,
+            ttl=settings.ocr_cache_ttl,
+            max_size=settings.ocr_cache_max_size,
+            max_distance=settings.ocr_cache_max_distance,
+            max_thumbnail_diff=settings.ocr_cache_max_thumbnail_diff
+        ) if settings.ocr_cache_enabled else None,
+        quality_stats=ImageQualityStats(redis=redis_conn),
+        metrics=OcrMetrics(redis=redis_conn) if settings.ocr_metrics_enabled else None
+    )
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+
+    logger.info("ocr worker started")
+    worker.run()
@@ -1,45 +1,181 @@
-from fastapi import APIRouter, Request, Response, Path, Query, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Request, Response, Path, Query, Depends, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
 from fastapi_jwt_auth import AuthJWT
 from controllers.CovidCheckupController import CovidCheckupCrud, CovidCheckupLogic
 from controllers.ClientController import ClientCrud, ClientFetch
 from controllers.InstitutionController import InstitutionFetch
 from controllers.LocationServiceController import LocationServiceFetch
 from dependencies.ClientDependant import (
-    identity_card_ocr_form, get_all_query_client_paginate,
-    get_all_query_client_export
+    identity_card_ocr_form, identity_card_ocr_job_form, identity_card_ocr_batch_form,
+    get_all_query_client_paginate, get_all_query_client_export
 )
 from schemas.clients.ClientSchema import (
-    ClientDataImageOcr, ClientCreate,
+    ClientDataImageOcr, ClientDataImageOcrBatch, ClientOcrJob, ClientOcrJobResult, ClientCreate,
     ClientUpdate, ClientPaginate,
     ClientExportData, ClientGetDataByNik,
-    ClientGetInfoByNik
+    ClientGetInfoByNik, ClientGetInfoByNikBatch
 )
-from libs.MagicImage import MagicImage
+from config import settings
 from typing import List
 
 router = APIRouter()
 
+async def detect_card_kind(request: Request, kind: str, image: bytes) -> str:
+    if kind != 'auto':
+        return kind
+
+    # colour of a thumbnail, cheap enough to not go through the worker pool
+    loop = asyncio.get_event_loop()
+    if detected := await loop.run_in_executor(None, request.app.state.card_classifier.classify, image):
+        return detected
+
+    raise HTTPException(status_code=422,detail="Cannot detect the kind of the card, please choose ktp, kis or paspor.")
+
 @router.post('/identity-card-ocr',response_model=ClientDataImageOcr,
     responses={
+        200: {
+            "description": "Successful Response, with mode nik_fast a returning client is prefilled from the db and ocr_step is nik_fast, ocr_profile is the speed/accuracy profile used",
+            "content": {"application/json": {"example": {
+                "nik": "5103051905990006",
+                "name": "NYOMAN PRADIPTA DEWANTARA",
+                "birth_date": "1999-05-19T00:00:00",
+                "birth_place": "BALIKPAPAN",
+                "gender": "LAKI-LAKI",
+                "address": "JL. MERAK C 4/34 PURI GADING",
+                "kind": "ktp",
+                "ocr_step": "nik_fast",
+                "ocr_profile": "balanced"
+            }}}
+        },
         413: {
             "description": "Request Entity Too Large",
             "content": {"application/json": {"example": {"detail": "An image cannot greater than {max_file_size} Mb."}}}
+        },
+        422: {
+            "description": "Image quality too low, the photo must be retaken, the kind of the card cannot be detected or unknown profile",
+            "content": {"application/json": {"example": {"detail": {"reason": "blurry", "message": "The image is too blurry, please retake the photo."}}}}
+        },
+        504: {
+            "description": "Image processing timeout",
+            "content": {"application/json": {"example": {"detail": "The image took too long to process, please try again."}}}
         }
     }
 )
 async def identity_card_ocr(request: Request, form_data: identity_card_ocr_form = Depends()):
-    image_ocr = MagicImage.save_image_to_storage(
-        file=form_data['image'].file,
-        path_upload='identity_ocr/{}'.format(form_data['kind'])
-    )
-    if form_data['kind'] == 'kis':
-        result = request.app.state.ocr_kis.extract_image_to_text(image_ocr)
-        MagicImage.delete_image(image_ocr,path_delete='identity_ocr/kis/')
-    if form_data['kind'] == 'ktp':
-        result = request.app.state.ocr_ktp.extract_image_to_text(image_ocr)
-        MagicImage.delete_image(image_ocr,path_delete='identity_ocr/ktp/')
-
-    return result
+    image, profile = await form_data['image'].read(), form_data['profile']
+    kind = await detect_card_kind(request, form_data['kind'], image)
+    ocr = getattr(request.app.state,f"ocr_{kind}")
+
+    # returning client only need the nik, the rest is prefilled from the db
+    if form_data['mode'] == 'nik_fast':
+        if (
+            (nik := await ocr.extract_nik_to_text(image,profile=profile)) and
+            # passport number is already validated by its check digit
+            (kind == 'paspor' or request.app.state.nik_extraction.nik_extract(nik)['valid']) and
+            (client := await ClientFetch.filter_by_nik(nik))
+        ):
+            return {**client, 'kind': kind, 'ocr_step': 'nik_fast', 'ocr_profile': profile}
+
+        # the image already passed the quality gate on the nik job
+        data = await ocr.extract_image_to_text(image,check_quality=False,profile=profile)
+        return {**data, 'kind': kind, 'ocr_profile': profile}
+
+    return {**await ocr.extract_image_to_text(image,profile=profile), 'kind': kind, 'ocr_profile': profile}
+
+@router.post('/identity-card-ocr-batch',response_model=List[ClientDataImageOcrBatch],
+    responses={
+        200: {
+            "description": "Result of every image, streamed as ndjson in completion order when stream is true",
+            "content": {"application/x-ndjson": {}}
+        },
+        409: {
+            "description": "Duplicate image",
+            "content": {"application/json": {"example": {"detail": "Each image must be unique."}}}
+        },
+        413: {
+            "description": "Request Entity Too Large",
+            "content": {"application/json": {"example": {"detail": "An image at index {index} cannot greater than {max_file_size} Mb."}}}
+        }
+    }
+)
+async def identity_card_ocr_batch(request: Request, form_data: identity_card_ocr_batch_form = Depends()):
+    async def extract_image(index: int, kind: str, image: bytes) -> ClientDataImageOcrBatch:
+        try:
+            kind = await detect_card_kind(request, kind, image)
+            data = await getattr(request.app.state,f"ocr_{kind}").extract_image_to_text(image)
+            return ClientDataImageOcrBatch(index=index,kind=kind,data={**data, 'kind': kind})
+        except HTTPException as err:
+            return ClientDataImageOcrBatch(index=index,kind=kind,error=err.detail)
+
+    # the worker pool bound how many of these actually run at the same time
+    jobs = [
+        extract_image(index, kind, await image.read())
+        for index, (kind, image) in enumerate(zip(form_data['kind'],form_data['images']),1)
+    ]
+
+    if form_data['stream']:
+        async def stream_result():
+            for job in asyncio.as_completed(jobs):
+                yield (await job).json() + "\n"
+
+        return StreamingResponse(stream_result(),media_type="application/x-ndjson")
+
+    return await asyncio.gather(*jobs)
+
+@router.post('/identity-card-ocr-job',status_code=202,response_model=ClientOcrJob,
+    responses={
+        202: {
+            "description": "Image queued, the result is polled or pushed by websocket with the job id",
+            "content": {"application/json": {"example": {"job_id": "string", "kind": "ktp", "status": "queued"}}}
+        },
+        413: {
+            "description": "Request Entity Too Large",
+            "content": {"application/json": {"example": {"detail": "An image cannot greater than {max_file_size} Mb."}}}
+        }
+    }
+)
+async def identity_card_ocr_job(request: Request, form_data: identity_card_ocr_job_form = Depends()):
+    image = await form_data['image'].read()
+    kind = await detect_card_kind(request, form_data['kind'], image)
+
+    job_id = request.app.state.ocr_jobs.submit(kind, image)
+    return {'job_id': job_id, 'kind': kind, 'status': 'queued'}
+
+@router.get('/identity-card-ocr-job/{job_id}',response_model=ClientOcrJobResult,
+    responses={
+        404: {
+            "description": "Job not found or expired",
+            "content": {"application/json": {"example": {"detail": "Job not found!"}}}
+        }
+    }
+)
+async def get_identity_card_ocr_job(request: Request, job_id: str = Path(...,min_length=32,max_length=32)):
+    if job := request.app.state.ocr_jobs.get(job_id):
+        return job
+    raise HTTPException(status_code=404,detail="Job not found!")
+
+@router.websocket('/ws-identity-card-ocr-job/{job_id}')
+async def websocket_identity_card_ocr_job(websocket: WebSocket, job_id: str):
+    ocr_jobs = websocket.app.state.ocr_jobs
+    await websocket.accept()
+    try:
+        # push every status change until the job finished
+        status = None
+        while job := ocr_jobs.get(job_id):
+            if job['status'] != status:
+                status = job['status']
+                await websocket.send_text(ClientOcrJobResult(**job).json())
+            if status in ['done','failed']:
+                break
+            await asyncio.sleep(settings.ocr_job_poll_interval)
+        else:
+            await websocket.send_json({'detail': 'Job not found!'})
+
+        await websocket.close()
+    except Exception:
+        # client went away before the job finished
+        pass
 
 @router.post('/create',status_code=201,
     responses={
@@ -108,6 +244,28 @@ async def get_client_data_by_nik(nik: str = Query(...,min_length=1,regex=r'^[A-Z
 async def get_client_info_by_nik(request: Request, nik: str = Query(...,min_length=1,regex=r'^[0-9]*$')):
     return request.app.state.nik_extraction.nik_extract(nik)
 
+@router.post('/get-info-by-nik-batch',response_model=List[ClientGetInfoByNik],
+    responses={
+        200: {
+            "description": "Info of every nik in the input order, streamed as ndjson when stream is true",
+            "content": {"application/x-ndjson": {}}
+        }
+    }
+)
+async def get_client_info_by_nik_batch(request: Request, nik_data: ClientGetInfoByNikBatch):
+    nik_extraction = request.app.state.nik_extraction
+
+    if nik_data.stream:
+        async def stream_result():
+            # decode chunk by chunk so the first line is sent before the whole batch is done
+            for start in range(0, len(nik_data.nik), settings.nik_batch_chunk_size):
+                chunk = nik_extraction.nik_extract_batch(nik_data.nik[start:start + settings.nik_batch_chunk_size])
+                yield "".join(ClientGetInfoByNik(**info).json() + "\n" for info in chunk)
+
+        return StreamingResponse(stream_result(),media_type="application/x-ndjson")
+
+    return nik_extraction.nik_extract_batch(nik_data.nik)
+
 @router.get('/all-clients',response_model=ClientPaginate)
 async def get_all_clients(query_string: get_all_query_client_paginate = Depends(), authorize: AuthJWT = Depends()):
     authorize.jwt_required()
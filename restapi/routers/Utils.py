@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Request, Path, Query, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi_jwt_auth import AuthJWT
-from schemas.utils.UtilSchema import UtilEncodingImageBase64
+from schemas.utils.UtilSchema import (
+    UtilEncodingImageBase64, UtilOcrCacheStats,
+    UtilOcrQualityStats, UtilOcrJobStats, UtilRegion
+)
 from libs.MagicImage import MagicImage
+from config import settings
+from typing import Dict, List
 
 router = APIRouter()
 
@@ -10,3 +16,71 @@ async def encoding_image_base64(util_data: UtilEncodingImageBase64, authorize: A
     authorize.jwt_required()
 
     return MagicImage.convert_image_as_base64(util_data.path_file)
+
+@router.get('/ocr-cache-stats',response_model=Dict[str,UtilOcrCacheStats])
+async def ocr_cache_stats(request: Request, authorize: AuthJWT = Depends()):
+    authorize.jwt_required()
+
+    if ocr_cache := request.app.state.ocr_cache:
+        return ocr_cache.stats()
+    return {}
+
+@router.get('/ocr-quality-stats',response_model=Dict[str,UtilOcrQualityStats])
+async def ocr_quality_stats(request: Request, authorize: AuthJWT = Depends()):
+    authorize.jwt_required()
+
+    return request.app.state.ocr_quality_stats.stats()
+
+@router.get('/ocr-job-stats',response_model=UtilOcrJobStats)
+async def ocr_job_stats(request: Request, authorize: AuthJWT = Depends()):
+    authorize.jwt_required()
+
+    return request.app.state.ocr_jobs.stats()
+
+@router.get('/metrics',response_class=PlainTextResponse,
+    responses={
+        200: {
+            "description": "Ocr metrics in the prometheus text format, scraped by prometheus",
+            "content": {"text/plain": {"example": 'ocr_stage_duration_seconds_count{kind="ktp",stage="total"} 1'}}
+        }
+    }
+)
+async def metrics(request: Request):
+    if ocr_metrics := request.app.state.ocr_metrics:
+        return ocr_metrics.render()
+    return ""
+
+@router.get('/regions/search',response_model=List[UtilRegion],
+    responses={
+        200: {
+            "description": "Province, kabupaten and kecamatan whose name or code start with q, a typo is allowed when nothing start with q",
+            "content": {"application/json": {"example": [{
+                "code": "510305",
+                "level": "subdistrict",
+                "name": "KUTA SELATAN",
+                "province": "BALI",
+                "district": "KAB. BADUNG",
+                "subdistrict": "KUTA SELATAN"
+            }]}}
+        }
+    }
+)
+async def region_search(
+    request: Request,
+    q: str = Query(...,min_length=1,max_length=100),
+    limit: int = Query(10,gt=0,le=settings.region_search_max_results)
+):
+    return request.app.state.region_trie.search(q,limit,settings.region_search_max_distance)
+
+@router.get('/regions/{code}/children',response_model=List[UtilRegion],
+    responses={
+        404: {
+            "description": "Region not found",
+            "content": {"application/json": {"example": {"detail": "Region not found!"}}}
+        }
+    }
+)
+async def region_children(request: Request, code: str = Path(...,regex=r'^[0-9]{2}([0-9]{2})?$')):
+    if children := request.app.state.region_trie.children_of(code):
+        return children
+    raise HTTPException(status_code=404,detail="Region not found!")
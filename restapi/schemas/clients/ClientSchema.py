@@ -7,9 +7,9 @@ from phonenumbers import (
     is_valid_number,
     parse as parse_phone_number
 )
-from pydantic import BaseModel, constr, EmailStr, validator
+from pydantic import BaseModel, constr, conlist, EmailStr, validator
 from libs.NikExtraction import NikExtraction
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional, Union
 from datetime import datetime
 from pytz import timezone
 from config import settings
@@ -32,10 +32,32 @@ class ClientDataImageOcr(ClientSchema):
     birth_place: Optional[str]
     gender: Optional[Literal['LAKI-LAKI','PEREMPUAN']]
     address: Optional[str]
+    kind: Optional[Literal['ktp','kis','paspor']]
+    ocr_step: Optional[str]
+    ocr_profile: Optional[str]
 
     @validator('birth_date', pre=True)
     def parse_birth_date(cls, v):
-        if v: return datetime.strptime(v, tf)
+        if v and isinstance(v, str): return datetime.strptime(v, tf)
+        return v
+
+class ClientDataImageOcrBatch(ClientSchema):
+    index: int
+    kind: Literal['ktp','kis','paspor','auto']
+    data: Optional[ClientDataImageOcr]
+    error: Optional[Union[str, Dict[str, str]]]
+
+class ClientOcrJob(ClientSchema):
+    job_id: str
+    kind: Literal['ktp','kis','paspor']
+    status: Literal['queued','processing','done','failed']
+
+class ClientOcrJobResult(ClientOcrJob):
+    result: Optional[ClientDataImageOcr]
+    error: Optional[Union[str, Dict[str, str]]]
+    retries: int
+    wait_time: Optional[float]
+    process_time: Optional[float]
 
 class ClientCrud(ClientSchema):
     nik: constr(strict=True, min_length=3, max_length=100)
@@ -149,6 +171,10 @@ class ClientGetInfoByNik(ClientSchema):
     gender: Optional[Literal['LAKI-LAKI','PEREMPUAN']]
     birth_date: Optional[datetime]
 
+class ClientGetInfoByNikBatch(ClientSchema):
+    nik: conlist(constr(strict=True, regex=r'^[0-9]*$'), min_items=1, max_items=settings.nik_batch_max_size)
+    stream: bool = False
+
 class ClientCovidCheckupData(ClientSchema):
     covid_checkups_id: str
     covid_checkups_checking_type: Literal['antigen','genose','pcr']
@@ -1,5 +1,6 @@
 import re
 from pydantic import BaseModel, FilePath, PathError, validator
+from typing import Literal, Optional
 
 class UtilSchema(BaseModel):
     class Config:
@@ -14,3 +15,31 @@ class UtilEncodingImageBase64(UtilSchema):
         if v and re.match("^.*static.*$", str(v)) is None:
             raise PathError()
         return v
+
+class UtilOcrCacheStats(UtilSchema):
+    hits: int
+    misses: int
+    size: int
+
+class UtilOcrQualityStats(UtilSchema):
+    passed: int
+    too_small: int
+    blurry: int
+    glare: int
+
+class UtilOcrJobStats(UtilSchema):
+    queued: int
+    processing: int
+    done: int
+    failed: int
+    retried: int
+    avg_wait_time: float
+    avg_process_time: float
+
+class UtilRegion(UtilSchema):
+    code: str
+    level: Literal['province','district','subdistrict']
+    name: str
+    province: str
+    district: Optional[str]
+    subdistrict: Optional[str]
@@ -1,13 +1,15 @@
-import pytest, bcrypt, os
+import pytest, bcrypt, os, time
 from copy import deepcopy
 from sqlalchemy.sql import select
-from config import database
+from config import database, settings
 from models.UserModel import user
 from models.GuardianModel import guardian
 from models.LocationServiceModel import location_service
 from models.InstitutionModel import institution
 from models.ClientModel import client
 from models.CovidCheckupModel import covid_checkup
+from libs.OcrWorkerPool import worker_initializer, ocr_instances
+from ocr_worker import OcrJobWorker
 
 class OperationTest:
     name = 'testtesttttttt'
@@ -116,3 +118,19 @@ class OperationTest:
     @pytest.mark.asyncio
     async def update_covid_checkup(self,id_: int, **kwargs):
         await database.execute(query=covid_checkup.update().where(covid_checkup.c.id == id_),values=kwargs)
+
+    # ================ OCR JOB SECTION ================
+
+    def run_ocr_job(self, client, job_id: str, timeout: int = 60) -> dict:
+        # worker in this process, the test never wait on a separate ocr-worker container
+        if not ocr_instances:
+            worker_initializer(settings.ocr_opencv_threads, settings.ocr_engine)
+
+        state = client.app.state
+        worker = OcrJobWorker(state.ocr_jobs, state.ocr_cache, state.ocr_quality_stats, state.ocr_metrics)
+        deadline = time.time() + timeout
+        while (job := state.ocr_jobs.get(job_id))['status'] not in ['done','failed']:
+            assert time.time() < deadline, f"job {job_id} not finished in {timeout}s"
+            if fetched := state.ocr_jobs.fetch(timeout=1):
+                worker.process(*fetched)
+        return job
@@ -1,9 +1,10 @@
-import pytest
+import pytest, json
 from pathlib import Path
 from .operationtest import OperationTest
 from datetime import datetime, timedelta
 from pytz import timezone
-from config import settings
+from config import settings, redis_binary_conn
+from libs.OcrJobQueue import OcrJobQueue
 
 tz = timezone(settings.timezone)
 tf = '%d-%m-%Y'
@@ -70,7 +71,11 @@ class TestClient(OperationTest):
         response = client.post(url,data={'kind': 'asd'})
         assert response.status_code == 422
         for x in response.json()['detail']:
-            if x['loc'][-1] == 'kind': assert x['msg'] == "unexpected value; permitted: 'ktp', 'kis'"
+            if x['loc'][-1] == 'kind': assert x['msg'] == "unexpected value; permitted: 'ktp', 'kis', 'paspor', 'auto'"
+        response = client.post(url,data={'mode': 'asd'})
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'mode': assert x['msg'] == "unexpected value; permitted: 'full', 'nik_fast'"
 
         # image required
         response = client.post(url,files={})
@@ -92,6 +97,11 @@ class TestClient(OperationTest):
             response = client.post(url,files={'image': tmp})
             assert response.status_code == 413
             assert response.json() == {'detail':'An image cannot greater than 5 Mb.'}
+        # profile must be defined in the settings
+        with open(self.test_image_dir + 'ktp1.jpg','rb') as tmp:
+            response = client.post(url,data={'kind': 'ktp', 'profile': 'asd'},files={'image': tmp})
+            assert response.status_code == 422
+            assert response.json() == {'detail': 'Profile must be one of fast, balanced, accurate.'}
 
     def test_identity_card_ocr(self,client):
         url = self.prefix + '/identity-card-ocr'
@@ -105,7 +115,10 @@ class TestClient(OperationTest):
                 'birth_date': '1999-05-19T00:00:00',
                 'birth_place': 'BALIKPAPAN',
                 'gender': 'LAKI-LAKI',
-                'address': 'JL MERAK C4/34 PURI GADING, AINGK. BHUANA GUBUG'
+                'address': 'JL MERAK C4/34 PURI GADING, AINGK. BHUANA GUBUG',
+                'kind': 'ktp',
+                'ocr_step': 'basic',
+                'ocr_profile': 'balanced'
             }
         # ktp perempuan
         with open(self.test_image_dir + 'ktp2.jpg','rb') as tmp:
@@ -117,20 +130,31 @@ class TestClient(OperationTest):
                 'birth_date': '1961-09-23T00:00:00',
                 'birth_place': 'BANJAR',
                 'gender': 'PEREMPUAN',
-                'address': 'JL. MERAK C 4/34 PURI GADING, LINGK. BHUANA GUB'
+                'address': 'JL. MERAK C 4/34 PURI GADING, LINGK. BHUANA GUB',
+                'kind': 'ktp',
+                'ocr_step': 'basic',
+                'ocr_profile': 'balanced'
             }
-        # wrong ktp
+        # wrong ktp, image too small to be read
         with open(self.test_image_dir + 'image.jpeg','rb') as tmp:
             response = client.post(url,data={'kind': 'ktp'}, files={'image': tmp})
+            assert response.status_code == 422
+            assert response.json()['detail']['reason'] == 'too_small'
+        # light card washed out by the exposure, its text is still readable so it is not glare
+        with open(self.test_image_dir + 'kis_light.jpg','rb') as tmp:
+            response = client.post(url,data={'kind': 'kis'}, files={'image': tmp})
             assert response.status_code == 200
-            assert response.json() == {
-                'nik': None,
-                'name': None,
-                'birth_date': None,
-                'birth_place': None,
-                'gender': None,
-                'address': None
-            }
+        # highlight wiping out the text of the card
+        with open(self.test_image_dir + 'ktp_glare.jpg','rb') as tmp:
+            response = client.post(url,data={'kind': 'ktp'}, files={'image': tmp})
+            assert response.status_code == 422
+            assert response.json()['detail']['reason'] == 'glare'
+        # kind detected from the colour of the card
+        with open(self.test_image_dir + 'ktp2.jpg','rb') as tmp:
+            response = client.post(url,data={'kind': 'auto'}, files={'image': tmp})
+            assert response.status_code == 200
+            assert response.json()['kind'] == 'ktp'
+            assert response.json()['nik'] == '5103056309510001'
         # kis laki-laki
         with open(self.test_image_dir + 'kis1.jpeg','rb') as tmp:
             response = client.post(url,data={'kind': 'kis'}, files={'image': tmp})
@@ -141,7 +165,10 @@ class TestClient(OperationTest):
                 'birth_date': '1999-05-19T00:00:00',
                 'birth_place': None,
                 'gender': None,
-                'address': '.JL. MERAK C 4/34 PURI GADING, LINGK. BHUANA GUBUG JIMBARAN, KUTA SELATAN, KAB. BADUNG'
+                'address': '.JL. MERAK C 4/34 PURI GADING, LINGK. BHUANA GUBUG JIMBARAN, KUTA SELATAN, KAB. BADUNG',
+                'kind': 'kis',
+                'ocr_step': 'basic',
+                'ocr_profile': 'balanced'
             }
         # kis perempuan
         with open(self.test_image_dir + 'kis2.jpeg','rb') as tmp:
@@ -153,21 +180,178 @@ class TestClient(OperationTest):
                 'birth_date': '1961-09-23T00:00:00',
                 'birth_place': None,
                 'gender': None,
-                'address': 'JL. MERAK C 4/34 PURI GADING, LINGK. BHUANA GUBUG JIMBARAN, KUTA SELATAN, KAB. BADUNG'
+                'address': 'JL. MERAK C 4/34 PURI GADING, LINGK. BHUANA GUBUG JIMBARAN, KUTA SELATAN, KAB. BADUNG',
+                'kind': 'kis',
+                'ocr_step': 'basic',
+                'ocr_profile': 'balanced'
             }
-        # wrong kis
+        with open(self.test_image_dir + 'kis2.jpeg','rb') as tmp:
+            response = client.post(url,data={'kind': 'auto'}, files={'image': tmp})
+            assert response.status_code == 200
+            assert response.json()['kind'] == 'kis'
+            assert response.json()['nik'] == '5103056309610001'
+        # wrong kis, image too small to be read
         with open(self.test_image_dir + 'image.jpeg','rb') as tmp:
             response = client.post(url,data={'kind': 'kis'}, files={'image': tmp})
+            assert response.status_code == 422
+            assert response.json()['detail']['reason'] == 'too_small'
+        # speed/accuracy profile chosen per request
+        with open(self.test_image_dir + 'ktp1.jpg','rb') as tmp:
+            response = client.post(url,data={'kind': 'ktp', 'profile': 'fast'}, files={'image': tmp})
+            assert response.status_code == 200
+            assert response.json()['ocr_profile'] == 'fast'
+            assert response.json()['ocr_step'] in ['basic','adaptive']
+        # paspor, read from the mrz
+        with open(self.test_image_dir + 'paspor.jpg','rb') as tmp:
+            response = client.post(url,data={'kind': 'paspor'}, files={'image': tmp})
             assert response.status_code == 200
             assert response.json() == {
-                'nik': None,
-                'name': None,
-                'birth_date': None,
+                'nik': 'L898902C3',
+                'name': 'ANNA MARIA ERIKSSON',
+                'birth_date': '1974-08-12T00:00:00',
                 'birth_place': None,
-                'gender': None,
-                'address': None
+                'gender': 'PEREMPUAN',
+                'address': None,
+                'kind': 'paspor',
+                'ocr_step': 'mrz',
+                'ocr_profile': 'balanced'
             }
 
+    def test_validation_identity_card_ocr_job(self,client):
+        url = self.prefix + '/identity-card-ocr-job'
+
+        # field required
+        response = client.post(url,data={})
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'kind': assert x['msg'] == 'field required'
+            if x['loc'][-1] == 'image': assert x['msg'] == 'field required'
+        # check all field type data
+        response = client.post(url,data={'kind': 'asd'})
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'kind': assert x['msg'] == "unexpected value; permitted: 'ktp', 'kis', 'paspor', 'auto'"
+        # job id must be 32 characters
+        response = client.get(url + '/1')
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'job_id': assert x['msg'] == 'ensure this value has at least 32 characters'
+
+    def test_identity_card_ocr_job(self,client):
+        url = self.prefix + '/identity-card-ocr-job'
+
+        with open(self.test_image_dir + 'ktp1.jpg','rb') as tmp:
+            response = client.post(url,data={'kind': 'ktp'}, files={'image': tmp})
+            assert response.status_code == 202
+            assert response.json()['status'] == 'queued'
+            job_id = response.json()['job_id']
+
+        assert self.run_ocr_job(client,job_id)['status'] == 'done'
+        # result pushed by websocket once the worker finished
+        with client.websocket_connect(self.prefix + f'/ws-identity-card-ocr-job/{job_id}') as websocket:
+            data = websocket.receive_json()
+            assert data['status'] == 'done'
+            assert data['result']['nik'] == '510305190599000006'
+
+        # polling
+        response = client.get(url + f'/{job_id}')
+        assert response.status_code == 200
+        assert response.json()['status'] == 'done'
+        assert response.json()['kind'] == 'ktp'
+        assert response.json()['result']['nik'] == '510305190599000006'
+        assert response.json()['retries'] == 0
+        assert type(response.json()['process_time']) == float
+
+        # image rejected by the quality gate is not retried
+        with open(self.test_image_dir + 'image.jpeg','rb') as tmp:
+            response = client.post(url,data={'kind': 'kis'}, files={'image': tmp})
+            job_id = response.json()['job_id']
+        assert self.run_ocr_job(client,job_id)['status'] == 'failed'
+        with client.websocket_connect(self.prefix + f'/ws-identity-card-ocr-job/{job_id}') as websocket:
+            data = websocket.receive_json()
+            assert data['status'] == 'failed'
+            assert data['error']['reason'] == 'too_small'
+            assert data['retries'] == 0
+
+        # job not found
+        response = client.get(url + '/' + '0' * 32)
+        assert response.status_code == 404
+        assert response.json() == {'detail': 'Job not found!'}
+
+    def test_identity_card_ocr_job_worker_crash(self,client):
+        class TestOcrJobQueue(OcrJobQueue):
+            prefix = 'ocr_job_test'
+
+        queue = TestOcrJobQueue(redis=redis_binary_conn,ttl=60,max_retries=2,visibility_timeout=0)
+        # worker died right after the job was moved to the processing list
+        job_id = queue.submit('ktp',b'image')
+        assert queue.fetch(timeout=1)[0] == job_id
+        assert queue.get(job_id)['status'] == 'processing'
+        assert queue.requeue_stale() == 1
+        assert queue.get(job_id)['status'] == 'queued'
+        assert queue.get(job_id)['retries'] == 1
+        # moved without started_at, the created_at is the deadline
+        redis_binary_conn.rpoplpush(queue.queue_key,queue.processing_key)
+        assert queue.requeue_stale() == 1
+        assert queue.get(job_id)['retries'] == 2
+
+        redis_binary_conn.delete(*redis_binary_conn.keys('ocr_job_test:*'))
+
+    def test_validation_identity_card_ocr_batch(self,client):
+        url = self.prefix + '/identity-card-ocr-batch'
+
+        # field required
+        response = client.post(url,data={})
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'kind': assert x['msg'] == 'field required'
+            if x['loc'][-1] == 'images': assert x['msg'] == 'field required'
+        # check all field type data
+        response = client.post(url,data={'kind': ['asd'], 'stream': 'asd'})
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 0: assert x['msg'] == "unexpected value; permitted: 'ktp', 'kis', 'paspor', 'auto'"
+            if x['loc'][-1] == 'stream': assert x['msg'] == 'value could not be parsed to a boolean'
+        # image must be unique
+        with open(self.test_image_dir + 'ktp1.jpg','rb') as tmp, \
+                open(self.test_image_dir + 'ktp1.jpg','rb') as tmp2:
+            response = client.post(url,data={'kind': ['ktp','ktp']},files=[('images',tmp),('images',tmp2)])
+            assert response.status_code == 409
+            assert response.json() == {'detail': 'Each image must be unique.'}
+        # every image must have a kind
+        with open(self.test_image_dir + 'ktp1.jpg','rb') as tmp, \
+                open(self.test_image_dir + 'kis1.jpeg','rb') as tmp2:
+            response = client.post(url,data={'kind': ['ktp']},files=[('images',tmp),('images',tmp2)])
+            assert response.status_code == 422
+            assert response.json() == {'detail': 'Each image must have a kind.'}
+
+    def test_identity_card_ocr_batch(self,client):
+        url = self.prefix + '/identity-card-ocr-batch'
+
+        with open(self.test_image_dir + 'ktp1.jpg','rb') as tmp, \
+                open(self.test_image_dir + 'kis2.jpeg','rb') as tmp2:
+            response = client.post(url,data={'kind': ['ktp','kis']},files=[('images',tmp),('images',tmp2)])
+            assert response.status_code == 200
+            assert [x['index'] for x in response.json()] == [1,2]
+            assert [x['kind'] for x in response.json()] == ['ktp','kis']
+            assert response.json()[0]['data']['nik'] == '510305190599000006'
+            assert response.json()[1]['data']['nik'] == '5103056309610001'
+        # stream result as ndjson
+        with open(self.test_image_dir + 'ktp1.jpg','rb') as tmp, \
+                open(self.test_image_dir + 'kis2.jpeg','rb') as tmp2:
+            response = client.post(url,data={'kind': ['ktp','kis'], 'stream': 'true'},files=[('images',tmp),('images',tmp2)])
+            assert response.status_code == 200
+            assert response.headers['content-type'] == 'application/x-ndjson'
+            result = [json.loads(x) for x in response.text.splitlines()]
+            assert sorted([x['index'] for x in result]) == [1,2]
+        # kind detected for every image
+        with open(self.test_image_dir + 'ktp1.jpg','rb') as tmp, \
+                open(self.test_image_dir + 'kis2.jpeg','rb') as tmp2:
+            response = client.post(url,data={'kind': ['auto','auto']},files=[('images',tmp),('images',tmp2)])
+            assert response.status_code == 200
+            assert [x['kind'] for x in response.json()] == ['ktp','kis']
+            assert [x['data']['kind'] for x in response.json()] == ['ktp','kis']
+
     def test_validation_create_client(self,client):
         url = self.prefix + "/create"
         # field required
@@ -430,6 +614,35 @@ class TestClient(OperationTest):
         assert type(response.json()['gender']) == str
         assert type(response.json()['address']) == str
 
+    def test_identity_card_ocr_nik_fast(self,client):
+        url = self.prefix + '/identity-card-ocr'
+        # returning client, prefilled from the db
+        with open(self.test_image_dir + 'kis1.jpeg','rb') as tmp:
+            response = client.post(url,data={'kind': 'kis', 'mode': 'nik_fast'}, files={'image': tmp})
+            assert response.status_code == 200
+            assert response.json() == {
+                'nik': '5103051905990006',
+                'name': 'NYOMAN PRADIPTA DEWANTARA',
+                'birth_date': '1999-08-22T00:00:00',
+                'birth_place': 'BALIKPAPAN',
+                'gender': 'LAKI-LAKI',
+                'address': 'PURIGADING',
+                'kind': 'kis',
+                'ocr_step': 'nik_fast',
+                'ocr_profile': 'balanced'
+            }
+        # new client, fallback to the whole card
+        with open(self.test_image_dir + 'kis2.jpeg','rb') as tmp:
+            response = client.post(url,data={'kind': 'kis', 'mode': 'nik_fast'}, files={'image': tmp})
+            assert response.status_code == 200
+            assert response.json()['nik'] == '5103056309610001'
+            assert response.json()['ocr_step'] != 'nik_fast'
+        # image rejected by the quality gate before the nik is read
+        with open(self.test_image_dir + 'image.jpeg','rb') as tmp:
+            response = client.post(url,data={'kind': 'ktp', 'mode': 'nik_fast'}, files={'image': tmp})
+            assert response.status_code == 422
+            assert response.json()['detail']['reason'] == 'too_small'
+
     def test_validation_get_client_info_by_nik(self,client):
         url = self.prefix + '/get-info-by-nik'
         # field required
@@ -464,6 +677,59 @@ class TestClient(OperationTest):
         assert type(response.json()['gender']) == str
         assert type(response.json()['birth_date']) == str
 
+    def test_validation_get_client_info_by_nik_batch(self,client):
+        url = self.prefix + '/get-info-by-nik-batch'
+        # field required
+        response = client.post(url,json={})
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'nik': assert x['msg'] == 'field required'
+        # all field blank
+        response = client.post(url,json={'nik': [], 'stream': ''})
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'nik': assert x['msg'] == 'ensure this value has at least 1 items'
+            if x['loc'][-1] == 'stream': assert x['msg'] == 'value could not be parsed to a boolean'
+        # check all field type data
+        response = client.post(url,json={'nik': [123, '1A']})
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 0: assert x['msg'] == 'str type expected'
+            if x['loc'][-1] == 1: assert x['msg'] == 'string does not match regex \"^[0-9]*$\"'
+        # batch too large
+        response = client.post(url,json={'nik': ['5103051905990006'] * (settings.nik_batch_max_size + 1)})
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'nik':
+                assert x['msg'] == f'ensure this value has at most {settings.nik_batch_max_size} items'
+
+    def test_get_client_info_by_nik_batch(self,client):
+        url = self.prefix + '/get-info-by-nik-batch'
+        nik = ['5103051905990006', '5103054101990006', '123', '9999991905990006']
+
+        response = client.post(url,json={'nik': nik})
+        assert response.status_code == 200
+        # same order and same result as one by one
+        assert [x['nik'] for x in response.json()] == nik
+        for x in response.json():
+            assert x == client.get(self.prefix + '/get-info-by-nik?nik=' + x['nik']).json()
+        assert response.json()[0]['valid'] is True
+        assert response.json()[1]['gender'] == 'PEREMPUAN'
+        assert response.json()[2]['valid'] is False
+        assert response.json()[3]['location_valid'] is False
+        # every length decoded like nik_extract, 51030510199 has the birth date of 10199
+        prefixes = [x[:length] for x in ['5103051019990006', '5103054101990006'] for length in range(1,17)]
+        response = client.post(url,json={'nik': prefixes})
+        assert response.status_code == 200
+        for x in response.json():
+            assert x == client.get(self.prefix + '/get-info-by-nik?nik=' + x['nik']).json()
+        assert response.json()[10]['birth_date'] is not None
+        # stream result as ndjson
+        response = client.post(url,json={'nik': nik, 'stream': True})
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/x-ndjson'
+        assert [json.loads(x)['nik'] for x in response.text.splitlines()] == nik
+
     def test_validation_get_all_clients(self,client):
         url = self.prefix + '/all-clients'
         # field required
@@ -1,4 +1,7 @@
-import pytest
+import pytest, io
+from PIL import Image
+from config import redis_conn
+from libs.OcrCache import OcrResultCache
 from .operationtest import OperationTest
 
 class TestUtil(OperationTest):
@@ -56,6 +59,170 @@ class TestUtil(OperationTest):
         assert response.status_code == 200
         assert type(response.json()) == str
 
+    def test_ocr_cache_stats(self,client):
+        response = client.post('/users/login',json={
+            'email': self.account_admin['email'],
+            'password': self.account_admin['password']
+        })
+
+        url = self.prefix + '/ocr-cache-stats'
+        # same image uploaded twice, the second one hit the cache
+        with open(self.test_image_dir + 'ktp1.jpg','rb') as tmp:
+            client.post('/clients/identity-card-ocr',data={'kind': 'ktp'}, files={'image': tmp})
+        response = client.get(url)
+        assert response.status_code == 200
+        hits = response.json()['ktp']['hits']
+
+        with open(self.test_image_dir + 'ktp1.jpg','rb') as tmp:
+            client.post('/clients/identity-card-ocr',data={'kind': 'ktp'}, files={'image': tmp})
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.json()['ktp']['hits'] == hits + 1
+        assert response.json()['ktp']['size'] >= 1
+
+    def test_ocr_cache_near_match(self,client):
+        cache = OcrResultCache(redis=redis_conn,ttl=60,max_size=10,max_distance=4,max_thumbnail_diff=2.0)
+        with open(self.test_image_dir + 'ktp_synthetic1.jpg','rb') as tmp:
+            image = tmp.read()
+        # another person on the same card layout, the dhash is within max_distance
+        with open(self.test_image_dir + 'ktp_synthetic2.jpg','rb') as tmp:
+            other_image = tmp.read()
+        with Image.open(io.BytesIO(image)) as img, io.BytesIO() as output:
+            img.save(output,'JPEG',quality=60)
+            recompressed = output.getvalue()
+
+        image_hash, other_hash = cache.image_hash(image), cache.image_hash(other_image)
+        assert cache.hamming_distance(image_hash.dhash,other_hash.dhash) <= 4
+
+        cache.set('ktp_test',image_hash,{'nik': '5103051905990006'})
+        assert cache.get('ktp_test',image_hash) == {'nik': '5103051905990006'}
+        assert cache.get('ktp_test',other_hash) is None
+        assert cache.get('ktp_test',cache.image_hash(recompressed)) == {'nik': '5103051905990006'}
+        # exact content only by default
+        cache.max_distance = 0
+        assert cache.get('ktp_test',cache.image_hash(recompressed)) is None
+
+        redis_conn.delete(*redis_conn.keys('ocr_cache:ktp_test:*'))
+        redis_conn.hdel('ocr_cache:stats','ktp_test:hits','ktp_test:misses')
+
+    def test_ocr_quality_stats(self,client):
+        response = client.post('/users/login',json={
+            'email': self.account_admin['email'],
+            'password': self.account_admin['password']
+        })
+
+        url = self.prefix + '/ocr-quality-stats'
+        response = client.get(url)
+        assert response.status_code == 200
+        too_small = response.json().get('kis',{}).get('too_small',0)
+        # image rejected by the quality gate is counted and never cached
+        with open(self.test_image_dir + 'image.jpeg','rb') as tmp:
+            response = client.post('/clients/identity-card-ocr',data={'kind': 'kis'}, files={'image': tmp})
+            assert response.status_code == 422
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.json()['kis']['too_small'] == too_small + 1
+
+    def test_ocr_job_stats(self,client):
+        response = client.post('/users/login',json={
+            'email': self.account_admin['email'],
+            'password': self.account_admin['password']
+        })
+
+        url = self.prefix + '/ocr-job-stats'
+        response = client.get(url)
+        assert response.status_code == 200
+        done = response.json()['done']
+        # every finished job is counted
+        with open(self.test_image_dir + 'kis1.jpeg','rb') as tmp:
+            job_id = client.post('/clients/identity-card-ocr-job',data={'kind': 'kis'}, files={'image': tmp}).json()['job_id']
+        assert self.run_ocr_job(client,job_id)['status'] == 'done'
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.json()['done'] == done + 1
+        assert response.json()['avg_process_time'] > 0
+
+    def test_ocr_metrics(self,client):
+        # stage timing is only returned when asked
+        with open(self.test_image_dir + 'kis1.jpeg','rb') as tmp:
+            response = client.post('/clients/identity-card-ocr',data={'kind': 'kis'}, files={'image': tmp})
+            assert 'server-timing' not in response.headers
+        with open(self.test_image_dir + 'kis1.jpeg','rb') as tmp:
+            response = client.post('/clients/identity-card-ocr',data={'kind': 'kis'}, files={'image': tmp},
+                headers={'X-Server-Timing': '1'})
+            assert 'cache;dur=' in response.headers['server-timing']
+
+        response = client.get(self.prefix + '/metrics')
+        assert response.status_code == 200
+        assert 'ocr_stage_duration_seconds_bucket{kind="kis",stage="total"' in response.text
+        assert 'ocr_field_total{kind="kis",field="nik"' in response.text
+
+    def test_validation_region_search(self,client):
+        url = self.prefix + '/regions/search'
+        # field required
+        response = client.get(url)
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'q': assert x['msg'] == 'field required'
+        # all field blank
+        response = client.get(url + '?q=&limit=0')
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'q': assert x['msg'] == 'ensure this value has at least 1 characters'
+            if x['loc'][-1] == 'limit': assert x['msg'] == 'ensure this value is greater than 0'
+        # check all field type data
+        response = client.get(url + '?q=kuta&limit=a')
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'limit': assert x['msg'] == 'value is not a valid integer'
+
+    def test_region_search(self,client):
+        url = self.prefix + '/regions/search'
+        # prefix of any word of the name
+        response = client.get(url + '?q=kuta sel')
+        assert response.status_code == 200
+        assert response.json()[0] == {
+            'code': '510305', 'level': 'subdistrict', 'name': 'KUTA SELATAN',
+            'province': 'BALI', 'district': 'KAB. BADUNG', 'subdistrict': 'KUTA SELATAN'
+        }
+        # province before kabupaten before kecamatan
+        response = client.get(url + '?q=bali&limit=3')
+        assert response.status_code == 200
+        assert len(response.json()) == 3
+        assert response.json()[0]['level'] == 'province'
+        # prefix of the code
+        response = client.get(url + '?q=5103')
+        assert response.status_code == 200
+        assert response.json()[0]['name'] == 'KAB. BADUNG'
+        assert all(x['code'].startswith('5103') for x in response.json())
+        # typo
+        response = client.get(url + '?q=denpsar')
+        assert response.status_code == 200
+        assert response.json()[0]['name'] == 'KOTA DENPASAR'
+        # nothing found
+        response = client.get(url + '?q=xyzq')
+        assert response.status_code == 200
+        assert response.json() == []
+
+    def test_region_children(self,client):
+        # code must be a province or kabupaten code
+        response = client.get(self.prefix + '/regions/510305/children')
+        assert response.status_code == 422
+        for x in response.json()['detail']:
+            if x['loc'][-1] == 'code': assert x['msg'] == 'string does not match regex "^[0-9]{2}([0-9]{2})?$"'
+        # region not found
+        response = client.get(self.prefix + '/regions/99/children')
+        assert response.status_code == 404
+        assert response.json() == {'detail': 'Region not found!'}
+
+        response = client.get(self.prefix + '/regions/51/children')
+        assert response.status_code == 200
+        assert all(x['level'] == 'district' and x['province'] == 'BALI' for x in response.json())
+        response = client.get(self.prefix + '/regions/5103/children')
+        assert response.status_code == 200
+        assert '510305' in [x['code'] for x in response.json()]
+        assert all(x['level'] == 'subdistrict' for x in response.json())
+
     @pytest.mark.asyncio
     async def test_delete_user_from_db(self,async_client):
         await self.delete_user_from_db()